@@ -1,21 +1,20 @@
-import yfinance as yf
-import pandas as pd
-import pandas_ta as ta
-import smtplib
 import os
 import datetime
 import sys
-from email.message import EmailMessage
-import requests
-from io import StringIO 
 from collections import Counter
 
+# Ciężkie moduły (yfinance, pandas, requests, smtplib) są importowane
+# leniwie wewnątrz etapów, które ich potrzebują - patrz startup_budget.py.
+
 # --- KONFIGURACJA ---
 EMAIL_SENDER = os.environ.get('EMAIL_SENDER')
 EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD')
 EMAIL_RECIPIENT = os.environ.get('EMAIL_RECIPIENT')
 SMTP_SERVER = 'smtp.gmail.com'
 SMTP_PORT = 465
+# Ostrzeżenie "blisko przecięcia": jutrzejsza zmiana ceny wystarczająca do przecięcia MA20/MA50
+NEAR_CROSS_MAX_MOVE = 2.0   # % od ostatniego zamknięcia
+NEAR_CROSS_LIMIT = 15       # wierszy na stronę w raporcie
 
 SOURCES = {
     'S&P 500 (Large Cap)': 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies',
@@ -23,77 +22,254 @@ SOURCES = {
 }
 
 def get_tickers_metadata(url):
+    # Zachowane dla zgodności - implementacja w universe.py
+    from universe import get_tickers_metadata as fetch
+    return fetch(url)
+
+def scan_market(metadata, lookback_window=5):
+    """
+    Jedno przejście po uniwersum: walidacja danych, sygnały przecięć,
+    migawka stanu każdego tickera (do agregatów sektorowych) oraz warianty
+    strategii z strategies.toml, a także przecięcia na świecach tygodniowych
+    i miesięcznych (timeframes.py) i klastry skorelowanych sygnałów
+    (correlation.py). Zwraca słownik {'bullish', 'bearish', 'snapshot',
+    'issues', 'strategies', 'strategy_info', 'timeframes', 'clusters', 'stale'}
+    ('stale' - tickery bez notowania z ostatniej sesji uniwersum).
+    """
+    import pandas as pd
+    from correlation import daily_returns, signal_clusters
+    from scanner import scan_in_chunks
+    from timeframes import SCAN_TIMEFRAMES, scan_period, timeframe_signals
+    tickers = list(metadata.keys())
+    if not tickers: return {'bullish': [], 'bearish': [], 'snapshot': pd.DataFrame(), 'issues': pd.DataFrame(),
+                            'strategies': pd.DataFrame(), 'strategy_info': {}, 'timeframes': [], 'clusters': [],
+                            'stale': []}
+    # Dane dzienne pobierane raz, w zakresie wystarczającym dla wyższych interwałów
+    period = scan_period('7mo')
+
+    # Strategie kompilowane raz; błąd w pliku nie zatrzymuje raportu
+    from strategies import compile_strategies, evaluate_strategies, load_strategies
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers)
-        df = pd.read_html(StringIO(response.text), flavor='lxml')[0]
-        df.rename(columns={'Security': 'Name', 'Company': 'Name', 'GICS Sector': 'Sector'}, inplace=True)
-        df['Symbol'] = df['Symbol'].str.replace('.', '-')
-        return df.set_index('Symbol')[['Name', 'Sector']].to_dict('index')
-    except Exception as e:
-        print(f"Błąd metadanych: {e}")
-        return {}
+        strategies = compile_strategies(load_strategies())
+    except (ValueError, OSError) as e:
+        print(f"Błąd w pliku strategii: {e}")
+        strategies = {}
+    # Ostatnia sesja widziana w dotychczasowych paczkach - wspólny koniec osi dla kolejnych
+    last_session = None
+
+    def process_chunk(batch):
+        nonlocal last_session
+        from providers import get_prices
+        from scanner import compute_indicators, find_signals, near_cross, ticker_snapshot
+        from sparklines import SPARK_SESSIONS
+        from trading_calendar import align_sessions
+        from validation import validate_prices
+        # Źródło cen wg PRICE_PROVIDER (Yahoo, cache, pliki lokalne) - patrz providers.py
+        px = get_prices(batch, period=period)
+        if not px: return [], [], [], [], [], [], [], []
+        # Walidacja całej macierzy przed wskaźnikami - błędne tickery do kwarantanny
+        px, issues = validate_prices(px)
+        # Wspólna oś sesji: wiersz -1 to ta sama data dla wszystkich tickerów
+        px, cal = align_sessions(px, last_session=last_session)
+        if len(cal['sessions']):
+            last_session = cal['sessions'][-1]
+        # Wskaźniki liczone raz dla całej paczki (macierz daty × tickery)
+        ind = compute_indicators(px)
+        # Świece tygodniowe/miesięczne z tej samej macierzy dziennej
+        tf_rows = timeframe_signals(px, metadata, SCAN_TIMEFRAMES, tickers=batch)
+        del px
+        # Dzienne zwroty (float32) do korelacji między paczkami - correlation.py
+        rets = daily_returns(ind['Close'])
+        bull, bear = find_signals(ind, metadata, lookback_window, tickers=batch, history=SPARK_SESSIONS)
+        hits = evaluate_strategies(ind, strategies, tickers=batch) if strategies else pd.DataFrame()
+        # Prognoza przecięć z tych samych macierzy - bez drugiego przejścia po danych
+        snap = ticker_snapshot(ind, metadata, cross_window=lookback_window).join(near_cross(ind))
+        return bull, bear, [snap], [issues], [hits], tf_rows, [rets], cal['stale']
+
+    # Paczki dobierane do limitu SCAN_MEMORY_MB (bez limitu - jedna paczka)
+    bullish, bearish, snapshots, issues, hits, tf_rows, rets, stale = scan_in_chunks(tickers, process_chunk, period=period,
+                                                                                     n_extra=6)
+    snapshot = pd.concat(snapshots) if snapshots else pd.DataFrame()
+    issues = pd.concat(issues) if issues else pd.DataFrame()
+    hits = pd.concat(hits) if strategies and hits else pd.DataFrame()
+    from validation import summarize
+    print(summarize(issues))
+    # Nieaktualne względem całego uniwersum: także z paczek sprzed przesunięcia last_session
+    # i te, które walidacja zgłosiła jako missing_last_bar
+    stale = set(stale)
+    if not snapshot.empty:
+        stale |= set(snapshot.index[snapshot['date'] < snapshot['date'].max()])
+    if not issues.empty and 'missing_last_bar' in issues:
+        stale |= set(issues.index[issues['missing_last_bar']])
+    stale = [t for t in tickers if t in stale]
+    if stale and last_session is not None:
+        print(f"Brak notowania z ostatniej sesji ({last_session:%Y-%m-%d}): {len(stale)} tickerów: "
+              f"{', '.join(stale[:20])}{'...' if len(stale) > 20 else ''}")
+    # Jak w find_signals: bez ostatniej sesji nie ma sygnału - paczka wyrównana przed przesunięciem
+    # last_session liczyła wiek od wcześniejszego dnia
+    if stale:
+        skip = set(stale)
+        bullish, bearish, tf_rows = ([r for r in rows if r['ticker'] not in skip] for rows in (bullish, bearish, tf_rows))
+        if not hits.empty:
+            hits = hits[~hits.index.isin(skip)]
+
+    # Ranking RS wymaga całego uniwersum, więc liczony jest po zebraniu paczek
+    if not snapshot.empty:
+        from ranking import RS_WINDOWS, attach_ranks, rank_returns
+        snapshot = snapshot.join(rank_returns(snapshot[list(RS_WINDOWS)]))
+        attach_ranks(bullish, snapshot)
+        attach_ranks(bearish, snapshot)
+    # Klastry skorelowanych sygnałów - zwroty ze wszystkich paczek w jednej macierzy
+    rets = pd.concat(rets, axis=1) if rets else pd.DataFrame()
+    clusters = signal_clusters(rets, bullish, bearish, metadata)
+    return {
+        'bullish': sorted(bullish, key=lambda x: x['age']),
+        'bearish': sorted(bearish, key=lambda x: x['age']),
+        'snapshot': snapshot,
+        'issues': issues,
+        'strategies': hits,
+        'strategy_info': {name: s['description'] for name, s in strategies.items()},
+        'timeframes': sorted(tf_rows, key=lambda x: x['age']),
+        'clusters': clusters,
+        'stale': stale,
+    }
 
 def analyze_market(metadata, lookback_window=5):
-    tickers = list(metadata.keys())
-    if not tickers: return [], []
-    data = yf.download(tickers, period="7mo", group_by='ticker', auto_adjust=True, progress=False)
-    bullish, bearish = [], []
-    
-    for ticker in tickers:
-        try:
-            if ticker not in data.columns.levels[0]: continue
-            df = data[ticker].dropna().copy()
-            if len(df) < 60: continue
-            
-            df['MA20'] = df['Close'].rolling(window=20).mean()
-            df['MA50'] = df['Close'].rolling(window=50).mean()
-            df['VolMA20'] = df['Volume'].rolling(window=20).mean()
-            df['RSI'] = ta.rsi(df['Close'], length=14)
-            adx_df = ta.adx(df['High'], df['Low'], df['Close'], length=14)
-            
-            found_type, sessions_ago = None, 0
-            for i in range(1, lookback_window + 1):
-                t_idx, y_idx = -i, -(i + 1)
-                if abs(y_idx) > len(df): break
-                t_r, y_r = df.iloc[t_idx], df.iloc[y_idx]
-                
-                if y_r['MA20'] <= y_r['MA50'] and t_r['MA20'] > t_r['MA50']:
-                    found_type, sessions_ago = 'bullish', i - 1
-                    break
-                elif y_r['MA20'] >= y_r['MA50'] and t_r['MA20'] < t_r['MA50']:
-                    found_type, sessions_ago = 'bearish', i - 1
-                    break
-
-            if found_type:
-                today = df.iloc[-1]
-                info = {
-                    'ticker': ticker, 'name': metadata[ticker].get('Name', 'N/A'),
-                    'sector': metadata[ticker].get('Sector', 'N/A'), 'close': today['Close'],
-                    'ma20': today['MA20'], 'ma50': today['MA50'],
-                    'dist_ma20': ((today['Close'] - today['MA20']) / today['MA20']) * 100,
-                    'rsi': today['RSI'], 'adx': adx_df.iloc[-1]['ADX_14'] if adx_df is not None else 0,
-                    'vol_ratio': today['Volume'] / today['VolMA20'] if today['VolMA20'] > 0 else 0,
-                    'age': sessions_ago
-                }
-                bullish.append(info) if found_type == 'bullish' else bearish.append(info)
-        except: continue
-    return sorted(bullish, key=lambda x: x['age']), sorted(bearish, key=lambda x: x['age'])
-
-def create_sector_summary(bullish, bearish):
+    result = scan_market(metadata, lookback_window)
+    return result['bullish'], result['bearish']
+
+def create_sector_summary(bullish, bearish, sectors=None):
     b_sectors = Counter([s['sector'] for s in bullish])
     d_sectors = Counter([s['sector'] for s in bearish])
     all_s = sorted(set(list(b_sectors.keys()) + list(d_sectors.keys())))
+    if sectors is not None and not sectors.empty:
+        all_s = sorted(set(all_s) | set(sectors.index))
     if not all_s: return ""
+
+    # Szerokość rynku w sektorze (scanner.sector_aggregates), jeśli jest dostępna
+    breadth_head = ""
+    fmt = lambda v, spec: "-" if v != v else format(v, spec)
+    if sectors is not None and not sectors.empty:
+        breadth_head = "<th>Spółek</th><th>&gt; MA50</th><th>RSI (med.)</th><th>ADX (śr.)</th>"
+    def breadth_cells(s):
+        if not breadth_head: return ""
+        if s not in sectors.index: return "<td></td>" * 4
+        r = sectors.loc[s]
+        return f"<td style='text-align:center;'>{int(r['members'])}</td>" \
+               f"<td style='text-align:center;'>{fmt(r['pct_above_ma50'], '.0f')}%</td>" \
+               f"<td style='text-align:center;'>{fmt(r['median_rsi'], '.1f')}</td>" \
+               f"<td style='text-align:center;'>{fmt(r['avg_adx'], '.1f')}</td>"
+
     rows = "".join([f"<tr><td style='padding:6px 10px;border-bottom:1px solid #eee;'>{s}</td>"
                     f"<td style='text-align:center;color:green;'><b>{b_sectors.get(s,'-')}</b></td>"
-                    f"<td style='text-align:center;color:red;'><b>{d_sectors.get(s,'-')}</b></td></tr>" for s in all_s])
+                    f"<td style='text-align:center;color:red;'><b>{d_sectors.get(s,'-')}</b></td>{breadth_cells(s)}</tr>" for s in all_s])
     return f"<div style='margin:10px 0;padding:12px;background:#fcfcfc;border:1px solid #eee;display:inline-block;'>" \
            f"<h4 style='margin:0 0 8px 0;font-size:14px;'>Podsumowanie Sektorów:</h4>" \
            f"<table style='font-size:13px;border-collapse:collapse;'><tr style='background:#f0f0f0;'>" \
-           f"<th>Sektor</th><th>Golden</th><th>Death</th></tr>{rows}</table></div>"
+           f"<th>Sektor</th><th>Golden</th><th>Death</th>{breadth_head}</tr>{rows}</table></div>"
+
+def create_strategies_html(hits, strategy_info, limit=15):
+    # Zwięzła tabela wariantów strategii: liczba trafień i pierwsze tickery
+    if hits is None or hits.empty or not strategy_info: return ""
+    from strategies import strategy_tickers
+    def cell(name, side, color):
+        found = strategy_tickers(hits, name, side)
+        more = f" (+{len(found) - limit})" if len(found) > limit else ""
+        return f"<td style='padding:6px 10px;vertical-align:top;'><b style='color:{color};'>{len(found)}</b> " \
+               f"<span style='font-size:12px;color:#555;'>{', '.join(found[:limit])}{more}</span></td>"
+    rows = "".join([f"<tr style='border-bottom:1px solid #eee;'><td style='padding:6px 10px;'><b>{name}</b><br>"
+                    f"<span style='font-size:12px;color:#666;'>{desc}</span></td>"
+                    f"{cell(name, 'bullish', 'green')}{cell(name, 'bearish', 'red')}</tr>" for name, desc in strategy_info.items()])
+    return f"<h4 style='font-size:16px;'>🧪 Warianty strategii</h4>" \
+           f"<table style='width:100%;font-size:13px;border-collapse:collapse;margin-bottom:25px;'>" \
+           f"<tr style='background:#f8f9fa;text-align:left;'><th style='padding:6px 10px;'>Strategia</th>" \
+           f"<th style='padding:6px 10px;'>Kupno</th><th style='padding:6px 10px;'>Sprzedaż</th></tr>{rows}</table>"
+
+def create_timeframes_html(rows, limit=30):
+    # Przecięcia MA20/MA50 na świecach tygodniowych i miesięcznych
+    from timeframes import TIMEFRAMES
+    if not rows: return ""
+    def cell(tf, side, color):
+        found = [f"{r['ticker']}{'' if r['age'] == 0 else '*'}" for r in rows if r['timeframe'] == tf and r['signal'] == side]
+        more = f" (+{len(found) - limit})" if len(found) > limit else ""
+        return f"<td style='padding:6px 10px;vertical-align:top;'><b style='color:{color};'>{len(found)}</b> " \
+               f"<span style='font-size:12px;color:#555;'>{', '.join(found[:limit])}{more}</span></td>"
+    body = "".join([f"<tr style='border-bottom:1px solid #eee;'><td style='padding:6px 10px;'><b>{spec['label']}</b></td>"
+                    f"{cell(tf, 'bullish', 'green')}{cell(tf, 'bearish', 'red')}</tr>"
+                    for tf, spec in TIMEFRAMES.items() if any(r['timeframe'] == tf for r in rows)])
+    return f"<h4 style='font-size:16px;'>🗓️ Wyższe interwały (MA20/MA50)</h4>" \
+           f"<table style='width:100%;font-size:13px;border-collapse:collapse;margin-bottom:25px;'>" \
+           f"<tr style='background:#f8f9fa;text-align:left;'><th style='padding:6px 10px;'>Interwał</th>" \
+           f"<th style='padding:6px 10px;'>Golden Cross</th><th style='padding:6px 10px;'>Death Cross</th></tr>{body}</table>"
+
+def create_near_cross_html(snapshot, metadata, max_move=NEAR_CROSS_MAX_MOVE, limit=NEAR_CROSS_LIMIT):
+    # Tickery, którym do przecięcia MA20/MA50 jutro wystarczy ruch ceny <= max_move %
+    if snapshot is None or snapshot.empty or 'trigger_pct' not in snapshot: return ""
+    near = snapshot[snapshot['trigger_pct'].abs() <= max_move]
+    near = near.assign(move=near['trigger_pct'].abs()).sort_values('move')
+    sides = [("🔼 Możliwy Golden Cross", near[near['cross_gap'] < 0], "green"),
+             ("🔽 Możliwy Death Cross", near[near['cross_gap'] > 0], "red")]
+    if not any(len(df) for _, df, _ in sides): return ""
+    fmt = lambda v, spec: "-" if v != v else format(v, spec)
+    html = "<h4 style='font-size:16px;'>⏳ Blisko przecięcia (jutrzejsza sesja)</h4>"
+    for title, df, color in sides:
+        if df.empty: continue
+        rows = "".join([f"<tr style='border-bottom:1px solid #eee;'><td style='padding:6px 10px;'><b>{t}</b></td>"
+                        f"<td style='font-size:12px;'>{metadata.get(t, {}).get('Name', 'N/A')}</td>"
+                        f"<td>{r['close']:.2f}</td><td>{r['ma20']:.1f}/{r['ma50']:.1f}</td>"
+                        f"<td>{r['cross_gap']:+.2f}%</td>"
+                        f"<td style='color:{color};font-weight:bold;'>{r['trigger_price']:.2f} ({r['trigger_pct']:+.1f}%)</td>"
+                        f"<td style='text-align:center;'>{fmt(r['sessions_to_cross'], '.0f')}</td></tr>"
+                        for t, r in df.head(limit).iterrows()])
+        html += f"<p style='color:{color};font-size:14px;margin:6px 0;'><b>{title}</b> ({len(df)})</p>" \
+                f"<table style='width:100%;font-size:13px;border-collapse:collapse;margin-bottom:15px;'>" \
+                f"<tr style='background:#f8f9fa;text-align:left;'><th style='padding:6px 10px;'>Ticker</th><th>Nazwa</th>" \
+                f"<th>Cena</th><th>MA 20/50</th><th>Różnica</th><th>Cena wyzwalająca</th><th>Sesji (trend)</th></tr>{rows}</table>"
+    return html
+
+def create_clusters_html(clusters, symbols, limit=8):
+    # Skorelowane grupy sygnałów w obrębie indeksu (co najmniej 2 spółki z indeksu)
+    rows = []
+    for c in clusters:
+        tickers = [t for t in c['tickers'] if t in symbols]
+        if len(tickers) < 2: continue
+        color = "green" if c['side'] == 'bullish' else "red"
+        peers = f"<br><span style='color:#888;'>Bez sygnału, skorelowane: {', '.join(f'{t} ({r:.2f})' for t, r in c['peers'])}</span>" if c['peers'] else ""
+        rows.append(f"<tr style='border-bottom:1px solid #eee;'><td style='padding:6px 10px;color:{color};'><b>{len(tickers)}</b></td>"
+                    f"<td style='padding:6px 10px;'>{c['sector']}</td><td style='text-align:center;'>{c['avg_corr']:.2f}</td>"
+                    f"<td style='padding:6px 10px;font-size:12px;'>{', '.join(tickers)}{peers}</td></tr>")
+    if not rows: return ""
+    more = f"<p style='font-size:12px;color:#888;'>+{len(rows) - limit} mniejszych klastrów</p>" if len(rows) > limit else ""
+    return f"<h4 style='font-size:16px;'>🧩 Klastry skorelowanych sygnałów</h4>" \
+           f"<table style='width:100%;font-size:13px;border-collapse:collapse;margin-bottom:10px;'>" \
+           f"<tr style='background:#f8f9fa;text-align:left;'><th style='padding:6px 10px;'>Spółek</th><th style='padding:6px 10px;'>Sektor (dominujący)</th>" \
+           f"<th>Śr. korelacja</th><th style='padding:6px 10px;'>Tickery</th></tr>{''.join(rows[:limit])}</table>{more}"
+
+def create_stale_html(stale, symbols, limit=40):
+    # Tickery bez notowania z ostatniej sesji - nie biorą udziału w dzisiejszych sygnałach
+    stale = [t for t in stale if t in symbols]
+    if not stale: return ""
+    more = f" (+{len(stale) - limit})" if len(stale) > limit else ""
+    return f"<p style='font-size:13px;color:#888;'>⏸️ <b>Brak notowania z ostatniej sesji ({len(stale)}):</b> " \
+           f"{', '.join(stale[:limit])}{more}</p>"
+
+def create_diff_html(changes, prev_date, symbols):
+    # Co weszło na listy sygnałów, wypadło z nich lub zmieniło się od poprzedniego raportu
+    if prev_date is None: return ""
+    from run_diff import SIGNAL_NAMES
+    colors = {1: "green", -1: "red"}
+    cells = []
+    for key, label in (('entered', 'Nowe'), ('changed', 'Zmiana'), ('exited', 'Wypadły')):
+        items = [f"<span style='color:{colors[s]};'>{t}</span>" + (f" ({SIGNAL_NAMES[w]}→{SIGNAL_NAMES[s]})" if key == 'changed' and w != s else "")
+                 for t, s, w in changes[key] if t in symbols]
+        cells.append(f"<tr><td style='padding:4px 10px;'><b>{label}</b></td><td style='text-align:center;'><b>{len(items)}</b></td>"
+                     f"<td style='font-size:12px;'>{', '.join(items) or '-'}</td></tr>")
+    return f"<div style='margin:10px 0;padding:12px;background:#fcfcfc;border:1px solid #eee;'>" \
+           f"<h4 style='margin:0 0 8px 0;font-size:14px;'>🔄 Zmiany od raportu z {prev_date}:</h4>" \
+           f"<table style='font-size:13px;border-collapse:collapse;'>{''.join(cells)}</table></div>"
 
 def create_table_html(signals, signal_type):
+    from sparklines import SPARK_SESSIONS
     if not signals: return "<p style='color:gray;font-size:14px;'>Brak sygnałów.</p>"
     
     age_colors = {0: "#007bff", 1: "#28a745", 2: "#ffc107", 3: "#fd7e14", 4: "#6f42c1"}
@@ -132,43 +308,142 @@ def create_table_html(signals, signal_type):
             dist_color = "#e74c3c" if s['dist_ma20'] > 0 else "#27ae60"
         dist_style = f"color: {dist_color}; font-weight: bold;"
 
+        # --- SIŁA RELATYWNA (ranga percentylowa w całym uniwersum) ---
+        rs = s.get('rs_rank', float('nan'))
+        rs_text = "-" if rs != rs else f"{rs:.0f}"
+        if rs >= 80:
+            rs_style = "color: #27ae60; font-weight: bold;"
+        elif rs <= 20:
+            rs_style = "color: #e67e22; font-weight: bold;"
+        else:
+            rs_style = "color: #444;"
+
+        spark = f"<img src='cid:{s['spark']}' width='90' height='24' alt=''>" if 'spark' in s else ""
+
         rows += f"""<tr style="border-bottom:1px solid #eee;font-size:14px;">
             <td style="padding:10px;"><b>{s['ticker']}</b></td><td style="font-size:13px;">{s['name']}</td>
             <td style="font-size:12px;color:#666;">{s['sector']}</td>
             <td style="text-align:center;"><span style="{age_style}">{age_text}</span></td>
             <td><b>{s['close']:.2f}</b></td><td style="color:#444;">{s['ma20']:.1f}/{s['ma50']:.1f}</td>
             <td style="{dist_style}">{s['dist_ma20']:+.1f}%</td><td style="{rsi_style}">{s['rsi']:.1f}</td>
-            <td style="{adx_style}">{s['adx']:.1f}</td><td style="{vol_style}">{s['vol_ratio']:.2f}x</td></tr>"""
+            <td style="{adx_style}">{s['adx']:.1f}</td><td style="{vol_style}">{s['vol_ratio']:.2f}x</td>
+            <td style="{rs_style}">{rs_text}</td><td>{spark}</td></tr>"""
     
     return f"""<table style="width:100%;border-collapse:collapse;margin-bottom:25px;">
         <tr style="background:#f8f9fa;text-align:left;border-bottom:2px solid #dee2e6;font-size:13px;">
-        <th style="padding:10px;">Ticker</th><th>Nazwa</th><th>Sektor</th><th style="text-align:center;">Wiek</th><th>Cena</th><th>MA 20/50</th><th>Dystans</th><th>RSI</th><th>ADX</th><th>Vol/Avg</th></tr>{rows}</table>"""
+        <th style="padding:10px;">Ticker</th><th>Nazwa</th><th>Sektor</th><th style="text-align:center;">Wiek</th><th>Cena</th><th>MA 20/50</th><th>Dystans</th><th>RSI</th><th>ADX</th><th>Vol/Avg</th><th>RS</th><th>Trend {SPARK_SESSIONS}d</th></tr>{rows}</table>"""
 
-def main():
-    date_str = datetime.date.today().strftime('%Y-%m-%d')
+def create_report_html(result, meta, members, date_str, changes, prev_date, fresh=None):
+    """
+    Cały HTML raportu z wyników scan_market, osobna sekcja dla każdego indeksu.
+    fresh - zbiór tickerów pokazywanych w tabelach sygnałów (tryb zmian) albo None.
+    """
+    from scanner import sector_aggregates
+    from universe import split_by_index
+    snapshot = result['snapshot']
     full_html = f"<html><body style='font-family:Segoe UI,Arial;color:#333;font-size:15px;'><div style='background:#2c3e50;color:white;padding:20px;text-align:center;'><h2>Raport S&P 500 & 600 - {date_str}</h2></div>"
-    for name, url in SOURCES.items():
-        meta = get_tickers_metadata(url)
-        bull, bear = analyze_market(meta)
-        full_html += f"<div style='padding:20px;'><h3>📊 Rynek: {name}</h3>{create_sector_summary(bull, bear)}" \
-                     f"<h4 style='color:green;font-size:18px;'>🚀 Golden Cross (Bycze)</h4>{create_table_html(bull, 'bullish')}" \
-                     f"<h4 style='color:red;font-size:18px;'>📉 Death Cross (Niedźwiedzie)</h4>{create_table_html(bear, 'bearish')}</div>"
+    shown = (lambda rows: rows) if fresh is None else (lambda rows: [s for s in rows if s['ticker'] in fresh])
+    bull_by_index, bear_by_index = split_by_index(result['bullish'], members), split_by_index(result['bearish'], members)
+    tf_by_index = split_by_index(result['timeframes'], members)
+    for name in SOURCES:
+        bull, bear = bull_by_index[name], bear_by_index[name]
+        sectors = sector_aggregates(snapshot[snapshot.index.isin(members[name])]) if not snapshot.empty else None
+        hits = result['strategies']
+        hits = hits[hits.index.isin(members[name])] if not hits.empty else hits
+        full_html += f"<div style='padding:20px;'><h3>📊 Rynek: {name}</h3>{create_diff_html(changes, prev_date, set(members[name]))}" \
+                     f"{create_sector_summary(bull, bear, sectors)}" \
+                     f"<h4 style='color:green;font-size:18px;'>🚀 Golden Cross (Bycze)</h4>{create_table_html(shown(bull), 'bullish')}" \
+                     f"<h4 style='color:red;font-size:18px;'>📉 Death Cross (Niedźwiedzie)</h4>{create_table_html(shown(bear), 'bearish')}" \
+                     f"{create_near_cross_html(snapshot[snapshot.index.isin(members[name])] if not snapshot.empty else None, meta)}" \
+                     f"{create_clusters_html(result['clusters'], set(members[name]))}" \
+                     f"{create_timeframes_html(tf_by_index[name])}" \
+                     f"{create_strategies_html(hits, result['strategy_info'])}" \
+                     f"{create_stale_html(result['stale'], set(members[name]))}</div>"
     full_html += """<div style='font-size:13px;color:gray;padding:20px;border-top:1px solid #eee;'>
         <b>Legenda kolorów:</b><br>
         - <b>Wiek</b>: Unikalny kolor dla każdego dnia (Niebieski = Dzisiaj, Zielony = 1d, itd.).<br>
         - <b>RSI</b>: <span style='color:#27ae60;font-weight:bold;'>Zielony (30-70)</span> zakres neutralny, <span style='color:#e67e22;font-weight:bold;'>Pomarańczowy</span> skrajne wykupienie/wyprzedanie.<br>
         - <b>ADX/Vol</b>: <span style='color:#27ae60;font-weight:bold;'>Zielony</span> silny trend/wysoki obrót, <span style='color:#e67e22;font-weight:bold;'>Pomarańczowy</span> budowanie trendu/podwyższony obrót.<br>
-        - <b>Dystans</b>: Zielony = zgodny z kierunkiem sygnału.
+        - <b>Dystans</b>: Zielony = zgodny z kierunkiem sygnału.<br>
+        - <b>Wyższe interwały</b>: * = przecięcie na poprzedniej, już zamkniętej świecy; bez gwiazdki = bieżąca świeca.<br>
+        - <b>Blisko przecięcia</b>: cena zamknięcia jutro, przy której MA20 zrówna się z MA50 (wzór zamknięty), oraz szacowana liczba sesji do przecięcia przy obecnym tempie zbliżania się średnich.<br>
+        - <b>Klastry</b>: sygnały tego samego kierunku, których dzienne stopy zwrotu z ostatnich sesji są silnie skorelowane - zwykle jeden temat rynkowy, a nie niezależne okazje.<br>
+        - <b>Zmiany</b>: Nowe = sygnał, którego nie było w poprzednim raporcie; Zmiana = odwrócony kierunek lub nowe przecięcie; Wypadły = sygnał z poprzedniego raportu, którego już nie ma.<br>
+        - <b>Trend</b>: cena (ciemna), MA20 (niebieska) i MA50 (pomarańczowa) z ostatnich sesji.<br>
+        - <b>RS</b>: Ranga siły relatywnej 0-100 (stopy zwrotu 1/3/6M względem całego uniwersum); <span style='color:#27ae60;font-weight:bold;'>Zielony</span> top 20%, <span style='color:#e67e22;font-weight:bold;'>Pomarańczowy</span> najsłabsze 20%.
     </div></body></html>"""
+    return full_html
+
+def main():
+    from universe import load_universe
+    date_str = datetime.date.today().strftime('%Y-%m-%d')
+    # Jedno pobranie dla sumy indeksów; wyniki rozdzielane z powrotem per indeks
+    meta, members = load_universe(SOURCES, fetch=get_tickers_metadata)
+    result = scan_market(meta)
+    # Miniwykresy dla wszystkich wierszy sygnałów jedną partią (z cache)
+    from sparklines import attach_sparklines
+    images = attach_sparklines(result['bullish'] + result['bearish'])
+    snapshot = result['snapshot']
+    if not snapshot.empty:
+        try:
+            from breadth import breadth_from_snapshot, update_breadth_history
+            update_breadth_history(breadth_from_snapshot(snapshot, members))
+        except Exception as e:
+            print(f"Błąd zapisu historii szerokości rynku: {e}")
+    # Stan tego uruchomienia vs poprzedni raport (run_diff.py)
+    from run_diff import REPORT_DIFF_ONLY, diff_runs, diff_tickers, load_previous_run, run_state, save_run
+    state = run_state(snapshot, result['bullish'], result['bearish'])
+    prev_date, prev = load_previous_run(date_str)
+    changes = {'entered': [], 'exited': [], 'changed': []}
+    if prev is not None:
+        diff = diff_runs(prev, state)
+        names = diff_tickers(diff)
+        changes = {k: list(zip(names[k], diff[k]['signal'].tolist(),
+                               (diff['was'] if k == 'changed' else diff[k]['signal']).tolist())) for k in changes}
+    try:
+        save_run(state, date_str)
+    except OSError as e:
+        print(f"Błąd zapisu stanu uruchomienia: {e}")
+    # Tryb zmian: tabele sygnałów tylko z nowymi i zmienionymi tickerami (podsumowania z pełnych list)
+    fresh = {t for k in ('entered', 'changed') for t, _, _ in changes[k]} if REPORT_DIFF_ONLY and prev is not None else None
+    # Te same wyniki i ten sam szablon co w poprzednim uruchomieniu = HTML z cache (report_cache.py)
+    from report_cache import already_sent, cached_render, content_key, mark_sent, template_version
+    # Szablon to nie tylko ten plik: etykiety interwałów, nazwy sygnałów i długość miniwykresów są w modułach obok
+    import run_diff, sparklines, timeframes
+    version = template_version(__file__, timeframes.__file__, run_diff.__file__, sparklines.__file__)
+    key = content_key(version, date_str, result, meta, members, changes, prev_date, fresh)
+    full_html = cached_render('sp500_sp600', key, lambda: create_report_html(result, meta, members, date_str, changes,
+                                                                             prev_date, fresh))
     
-    if EMAIL_SENDER and EMAIL_RECIPIENT:
+    subject = f"📊 Raport Giełdowy - {date_str}"
+    sent_key = content_key(EMAIL_RECIPIENT, subject, full_html)
+    if EMAIL_SENDER and EMAIL_RECIPIENT and already_sent(sent_key):
+        # Ponowne uruchomienie z tymi samymi sygnałami - ten mail już wyszedł
+        print("Ten raport został już wysłany - pomijam wysyłkę.")
+    elif EMAIL_SENDER and EMAIL_RECIPIENT:
+        import smtplib
+        from email.message import EmailMessage
         msg = EmailMessage()
-        msg['Subject'] = f"📊 Raport Giełdowy - {date_str}"
+        msg['Subject'] = subject
         msg['From'], msg['To'] = EMAIL_SENDER, EMAIL_RECIPIENT
         msg.add_alternative(full_html, subtype='html')
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as smtp:
-            smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            smtp.send_message(msg)
-            print("Wysłano raport.")
+        html_part = msg.get_payload()[-1]
+        # Tylko obrazki użyte w raporcie (w trybie zmian część wierszy jest pominięta)
+        for cid, png in images.items():
+            if cid not in full_html: continue
+            html_part.add_related(png, 'image', 'png', cid=f"<{cid}>")
+        try:
+            with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as smtp:
+                smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
+                smtp.send_message(msg)
+                mark_sent(sent_key)
+                print("Wysłano raport.")
+        except Exception as e:
+            # Stan, historia i HTML są już zapisane w data/ - ponowne uruchomienie tylko wyśle maila.
+            # Kod błędu dopiero teraz, żeby job był oznaczony jako nieudany.
+            print(f"Błąd wysyłki e-maila: {e}")
+            sys.exit(1)
 
-if __name__ == "__main__": main()
+if __name__ == "__main__":
+    from profiling import run_profiled
+    run_profiled(main)
@@ -0,0 +1,125 @@
+import os
+import sys
+
+# --- HISTORIA SZEROKOŚCI RYNKU ---
+# Jeden wiersz na indeks i dzień: ile spółek ma MA20 > MA50, RSI > 70,
+# RSI < 30 i ADX > 25. Codzienny skan dopisuje bieżący dzień (z migawki
+# tickerów), a historię można odtworzyć z lokalnego archiwum cen jednym
+# wektorowym przejściem po wszystkich datach.
+
+from scanner import DATA_DIR
+
+BREADTH_FILE = os.path.join(DATA_DIR, 'breadth_history.csv')
+BREADTH_COLUMNS = ['members', 'ma20_above_ma50', 'rsi_above_70', 'rsi_below_30', 'adx_above_25']
+
+def _counts(ma20, ma50, rsi, adx):
+    # Działa zarówno na wektorach (migawka), jak i macierzach daty × tickery
+    axis = -1
+    return {
+        'members': (ma50 == ma50).sum(axis=axis),
+        'ma20_above_ma50': (ma20 > ma50).sum(axis=axis),
+        'rsi_above_70': (rsi > 70).sum(axis=axis),
+        'rsi_below_30': (rsi < 30).sum(axis=axis),
+        'adx_above_25': (adx > 25).sum(axis=axis),
+    }
+
+def breadth_from_snapshot(snapshot, members):
+    """
+    Wiersze szerokości rynku na ostatnią sesję z migawki scanner.ticker_snapshot.
+    Zwraca DataFrame z kolumnami date, index + BREADTH_COLUMNS.
+    """
+    import pandas as pd
+    if snapshot.empty:
+        return pd.DataFrame(columns=['date', 'index'] + BREADTH_COLUMNS)
+    date = pd.Timestamp(snapshot['date'].max()).normalize()
+    rows = []
+    for index_name, symbols in members.items():
+        snap = snapshot[snapshot.index.isin(symbols)]
+        counts = _counts(*(snap[c].to_numpy(dtype=float) for c in ('ma20', 'ma50', 'rsi', 'adx')))
+        rows.append({'date': date, 'index': index_name, **{k: int(v) for k, v in counts.items()}})
+    return pd.DataFrame(rows)
+
+def breadth_from_matrices(ind, members, store=None):
+    """
+    Szerokość rynku dla wszystkich dat naraz z macierzy wskaźników
+    (scanner.compute_indicators). Jedno przejście na indeks, bez pętli po datach.
+    Z indeksem przedziałów (membership.load_membership) każda data liczona jest
+    na ówczesnym składzie indeksu zamiast dzisiejszego.
+    """
+    import numpy as np
+    import pandas as pd
+    from membership import membership_mask
+    frames = []
+    for index_name, symbols in members.items():
+        if store is not None and index_name in store:
+            close = ind['Close']
+            mask = membership_mask(store, index_name, close.index, close.columns).to_numpy()
+            cols = mask.any(axis=0)
+            pit = mask[:, cols]
+            counts = _counts(*(np.where(pit, ind[c].to_numpy(dtype=float)[:, cols], np.nan)
+                               for c in ('MA20', 'MA50', 'RSI', 'ADX')))
+        else:
+            cols = ind['Close'].columns.isin(symbols)
+            counts = _counts(*(ind[c].to_numpy(dtype=float)[:, cols] for c in ('MA20', 'MA50', 'RSI', 'ADX')))
+        df = pd.DataFrame(counts, index=ind['Close'].index)
+        df = df[df['members'] > 0]
+        frames.append(df.assign(index=index_name).rename_axis('date').reset_index())
+    return pd.concat(frames, ignore_index=True)[['date', 'index'] + BREADTH_COLUMNS]
+
+def load_breadth_history(path=BREADTH_FILE):
+    import pandas as pd
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['date', 'index'] + BREADTH_COLUMNS)
+    return pd.read_csv(path, parse_dates=['date'])
+
+def update_breadth_history(rows, path=BREADTH_FILE):
+    """
+    Dopisuje wiersze do historii; istniejące wpisy dla tej samej pary
+    (date, index) są zastępowane, więc ponowne uruchomienie jest bezpieczne.
+    """
+    import pandas as pd
+    history = load_breadth_history(path)
+    rows = rows.assign(date=pd.to_datetime(rows['date']).dt.normalize())
+    merged = pd.concat([history, rows], ignore_index=True)
+    merged = merged.drop_duplicates(subset=['date', 'index'], keep='last').sort_values(['date', 'index'])
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    merged.to_csv(path, index=False, date_format='%Y-%m-%d')
+    return merged
+
+def load_price_archive(path):
+    """
+    Lokalne archiwum cen w kształcie wyniku yf.download(group_by='ticker'):
+    pickle (.pkl) albo CSV z dwuwierszowym nagłówkiem (ticker, pole).
+    """
+    import pandas as pd
+    if path.endswith('.pkl'):
+        return pd.read_pickle(path)
+    return pd.read_csv(path, header=[0, 1], index_col=0, parse_dates=True)
+
+def backfill(archive_path, sources, path=BREADTH_FILE):
+    from indicators import price_fields
+    from scanner import compute_indicators
+    from membership import load_membership
+    from trading_calendar import align_sessions
+    from universe import load_universe
+    from validation import summarize, validate_prices
+    _, members = load_universe(sources)
+    store = load_membership(members)
+    if store is None:
+        print("Brak tabeli zmian składu - historia liczona na dzisiejszym składzie indeksów.")
+    # Te same kroki co w skanie: kwarantanna błędnych danych, wspólna oś sesji NYSE
+    px, issues = validate_prices(price_fields(load_price_archive(archive_path)))
+    print(summarize(issues))
+    px, _ = align_sessions(px)
+    ind = compute_indicators(px)
+    rows = breadth_from_matrices(ind, members, store)
+    history = update_breadth_history(rows, path)
+    print(f"Historia szerokości rynku: {len(rows)} wierszy z archiwum, razem {len(history)} w {path}.")
+
+if __name__ == "__main__":
+    # Odtworzenie historii: python breadth.py <archiwum cen .pkl/.csv>
+    if len(sys.argv) != 2:
+        print("Użycie: python breadth.py <archiwum_cen.pkl|.csv>")
+        sys.exit(1)
+    from SP500_SP600_scan import SOURCES
+    backfill(sys.argv[1], SOURCES)
@@ -0,0 +1,119 @@
+import os
+
+# --- KORELACJE I KLASTRY TICKERÓW Z SYGNAŁAMI ---
+# Gdy 40 spółek daje Golden Cross tego samego dnia, to często jeden
+# skorelowany temat (np. półprzewodniki po raporcie lidera), a nie 40
+# niezależnych okazji. Dla tickerów z sygnałami liczymy macierz korelacji
+# dziennych stóp zwrotu z ostatnich CLUSTER_SESSIONS sesji - kilka mnożeń
+# macierzy (BLAS) zamiast pętli po parach - i grupujemy je w klastry.
+# Z SCAN_CLUSTER_UNIVERSE=1 macierz liczona jest dla całego uniwersum
+# (1100 × 1100 to nadal ułamek sekundy), a przy każdym klastrze pokazywane są
+# spółki bez sygnału najmocniej z nim skorelowane.
+
+CLUSTER_SESSIONS = 120
+CLUSTER_MIN_CORR = float(os.environ.get('SCAN_CLUSTER_MIN_CORR', 0.6))
+CLUSTER_UNIVERSE = os.environ.get('SCAN_CLUSTER_UNIVERSE') == '1'
+CLUSTER_PEERS = 5
+# Minimalna liczba zwrotów w oknie, żeby ticker brał udział w korelacjach
+MIN_RETURNS = 40
+
+def daily_returns(close, sessions=CLUSTER_SESSIONS):
+    """
+    Logarytmiczne stopy zwrotu z ostatnich sessions sesji (float32, daty × tickery).
+    """
+    import numpy as np
+    import pandas as pd
+    tail = close.iloc[-sessions - 1:]
+    values = tail.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rets = np.log(values[1:] / values[:-1])
+    return pd.DataFrame(rets.astype(np.float32), index=tail.index[1:], columns=tail.columns)
+
+def correlation_matrix(returns):
+    """
+    Macierz korelacji kolumn (tickery × tickery, float32) z mnożeń macierzy:
+    Z.T @ Z dla zwrotów pomniejszonych o średnią (braki = 0), a w mianowniku sumy
+    kwadratów tylko z sesji wspólnych dla pary ((Z²).T @ M). Tickery z mniej
+    niż MIN_RETURNS zwrotami dostają NaN.
+    """
+    import numpy as np
+    x = returns.to_numpy(dtype=np.float32)
+    valid = np.isfinite(x)
+    n = valid.sum(axis=0)
+    mask = valid.astype(np.float32)
+    mean = np.where(valid, x, 0).sum(axis=0) / np.maximum(n, 1)
+    z = np.where(valid, x - mean, 0).astype(np.float32)
+    cov = z.T @ z
+    # ss[i, j] = suma z_i² po sesjach, w których j też ma zwrot
+    ss = (z * z).T @ mask
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.sqrt(ss * ss.T)
+    ok = n >= MIN_RETURNS
+    corr[~ok] = np.nan
+    corr[:, ~ok] = np.nan
+    np.fill_diagonal(corr, np.where(ok, 1.0, np.nan))
+    return corr
+
+def cluster_indices(corr, min_corr=CLUSTER_MIN_CORR):
+    """
+    Klastry (listy indeksów, co najmniej 2 elementy, od największego). Zachłannie:
+    ticker z największą liczbą sąsiadów (korelacja >= min_corr) zabiera wszystkich
+    swoich nieprzydzielonych sąsiadów; bez efektu łańcucha jak w single-linkage.
+    """
+    import numpy as np
+    with np.errstate(invalid='ignore'):
+        adj = corr >= min_corr
+    np.fill_diagonal(adj, False)
+    free = np.ones(len(adj), dtype=bool)
+    clusters = []
+    while free.any():
+        degree = (adj & free).sum(axis=1) * free
+        leader = int(degree.argmax())
+        if degree[leader] == 0:
+            break
+        members = np.flatnonzero(adj[leader] & free)
+        members = np.concatenate([[leader], members])
+        free[members] = False
+        clusters.append(members)
+    return sorted(clusters, key=len, reverse=True)
+
+def signal_clusters(returns, bullish, bearish, metadata, min_corr=CLUSTER_MIN_CORR, universe=CLUSTER_UNIVERSE):
+    """
+    Klastry osobno dla sygnałów kupna i sprzedaży. Zwraca listę słowników
+    {'side', 'tickers', 'sector' (najczęstszy), 'avg_corr', 'peers'}; peers
+    (spółki bez sygnału najmocniej skorelowane z klastrem) tylko z universe=True.
+    """
+    import numpy as np
+    from collections import Counter
+    if returns is None or returns.empty:
+        return []
+    signal_tickers = {t for rows in (bullish, bearish) for t in (r['ticker'] for r in rows)}
+    columns = list(returns.columns) if universe else [t for t in returns.columns if t in signal_tickers]
+    if len(columns) < 2:
+        return []
+    corr = correlation_matrix(returns[columns])
+    pos = {t: i for i, t in enumerate(columns)}
+    others = np.array([t not in signal_tickers for t in columns])
+
+    out = []
+    for side, rows in (('bullish', bullish), ('bearish', bearish)):
+        idx = np.array([pos[r['ticker']] for r in rows if r['ticker'] in pos], dtype=int)
+        if len(idx) < 2:
+            continue
+        sub = corr[np.ix_(idx, idx)]
+        for members in cluster_indices(sub, min_corr):
+            cols = idx[members]
+            block = corr[np.ix_(cols, cols)]
+            tickers = [columns[i] for i in cols]
+            sectors = Counter(metadata.get(t, {}).get('Sector', 'N/A') for t in tickers)
+            cluster = {'side': side, 'tickers': tickers, 'sector': sectors.most_common(1)[0][0],
+                       'avg_corr': float(np.nanmean(block[~np.eye(len(cols), dtype=bool)])), 'peers': []}
+            if universe and others.any():
+                # Średnia korelacja z członkami klastra, tylko dla spółek bez sygnału
+                rows_c = corr[cols]
+                counts = np.isfinite(rows_c).sum(axis=0)
+                link = np.where(others & (counts > 0), np.nansum(rows_c, axis=0) / np.maximum(counts, 1), np.nan)
+                best = np.argsort(-np.nan_to_num(link, nan=-np.inf))[:CLUSTER_PEERS]
+                cluster['peers'] = [(columns[i], float(link[i])) for i in best if link[i] >= min_corr]
+            out.append(cluster)
+    return out
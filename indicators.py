@@ -0,0 +1,252 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Numba jest opcjonalna: jeśli jest zainstalowana, rekurencja Wildera działa
+# jako skompilowana pętla; w przeciwnym razie używamy wersji NumPy.
+# Przy INDICATORS_BACKEND=numpy nie jest nawet importowana - krótkie
+# uruchomienia na kilkudziesięciu tickerach (watchlist.py) nie płacą za jej start.
+njit = None
+if os.environ.get('INDICATORS_BACKEND') != 'numpy':
+    try:
+        from numba import njit
+    except ImportError:
+        pass
+
+# --- WSPÓLNE WSKAŹNIKI (RSI / ADX) ---
+# Jedna definicja dla wszystkich skanerów. Każda funkcja przyjmuje Series
+# (jeden ticker) albo DataFrame daty × tickery i liczy całą macierz naraz.
+#
+# Wygładzanie Wildera: ewm(alpha=1/period, min_periods=period), czyli to samo,
+# co ewm(com=period-1) z dawnego calculate_rsi w main2/3/4. Wartości NaN
+# (dni przed debiutem spółki, luki w notowaniach) są pomijane przy liczeniu.
+
+RSI_PERIOD = 14
+ADX_PERIOD = 14
+
+# 'numba' albo 'numpy' - domyślnie najszybszy dostępny wariant
+BACKEND = os.environ.get('INDICATORS_BACKEND', 'numba' if njit is not None else 'numpy')
+
+def _wilder_ewm_loop(x, period):
+    # Rekurencja ewm(adjust=True) kolumna po kolumnie, na skalarach:
+    # licznik i mianownik wag zanikają co sesję, NaN tylko postarza wagi.
+    n_rows, n_cols = x.shape
+    decay = 1.0 - 1.0 / period
+    out = np.empty((n_rows, n_cols))
+    for j in range(n_cols):
+        num, den, nobs = 0.0, 0.0, 0
+        for t in range(n_rows):
+            v = x[t, j]
+            num *= decay
+            den *= decay
+            if v == v:
+                num += v
+                den += 1.0
+                nobs += 1
+            out[t, j] = num / den if nobs >= period else np.nan
+    return out
+
+def _wilder_ewm_numpy(x, period):
+    # Ta sama rekurencja, ale pętla po sesjach i wektor po wszystkich tickerach
+    decay = 1.0 - 1.0 / period
+    out = np.empty(x.shape)
+    num = np.zeros(x.shape[1])
+    den = np.zeros(x.shape[1])
+    nobs = np.zeros(x.shape[1], dtype=np.int64)
+    for t in range(x.shape[0]):
+        ok = ~np.isnan(x[t])
+        num = num * decay + np.where(ok, x[t], 0.0)
+        den = den * decay + ok
+        nobs += ok
+        out[t] = np.where(nobs >= period, num / np.where(den > 0, den, 1.0), np.nan)
+    return out
+
+def _rsi_loop(close, period):
+    # Całe RSI w jednej pętli: różnica, zysk/strata i dwa wygładzenia Wildera
+    n_rows, n_cols = close.shape
+    decay = 1.0 - 1.0 / period
+    out = np.empty((n_rows, n_cols))
+    for j in range(n_cols):
+        g_num, l_num, den, nobs = 0.0, 0.0, 0.0, 0
+        prev = np.nan
+        for t in range(n_rows):
+            c = close[t, j]
+            g_num *= decay
+            l_num *= decay
+            den *= decay
+            if c == c:
+                delta = c - prev if prev == prev else 0.0
+                g_num += max(delta, 0.0)
+                l_num += max(-delta, 0.0)
+                den += 1.0
+                nobs += 1
+            prev = c
+            if nobs >= period:
+                rs = (g_num / den) / (l_num / den)
+                out[t, j] = 100.0 - 100.0 / (1.0 + rs)
+            else:
+                out[t, j] = np.nan
+    return out
+
+def _adx_loop(high, low, close, period):
+    # Cały ADX w jednej pętli: TR, +DM/-DM, trzy wygładzenia (ATR, +DI, -DI),
+    # DX i czwarte wygładzenie (ADX). Każdy etap ma własny licznik obserwacji.
+    n_rows, n_cols = close.shape
+    decay = 1.0 - 1.0 / period
+    out = np.empty((n_rows, n_cols))
+    for j in range(n_cols):
+        tr_num, tr_den, tr_obs = 0.0, 0.0, 0
+        p_num, p_den, p_obs = 0.0, 0.0, 0
+        m_num, m_den, m_obs = 0.0, 0.0, 0
+        x_num, x_den, x_obs = 0.0, 0.0, 0
+        ph, pl, pc = np.nan, np.nan, np.nan
+        for t in range(n_rows):
+            h, l, c = high[t, j], low[t, j], close[t, j]
+            tr_num *= decay
+            tr_den *= decay
+            p_num *= decay
+            p_den *= decay
+            m_num *= decay
+            m_den *= decay
+            x_num *= decay
+            x_den *= decay
+
+            tr = np.nan
+            if c == c:
+                tr = h - l
+                v = abs(h - pc)
+                if tr != tr or v > tr:
+                    tr = v
+                v = abs(l - pc)
+                if tr != tr or v > tr:
+                    tr = v
+            up = np.nan
+            if h == h:
+                up = h - ph if ph == ph else 0.0
+            down = np.nan
+            if l == l:
+                down = pl - l if pl == pl else 0.0
+            ph, pl, pc = h, l, c
+
+            if tr == tr:
+                tr_num += tr
+                tr_den += 1.0
+                tr_obs += 1
+            if up == up:
+                p_num += up if (up > down and up > 0) else 0.0
+                p_den += 1.0
+                p_obs += 1
+            if down == down:
+                m_num += down if (down > up and down > 0) else 0.0
+                m_den += 1.0
+                m_obs += 1
+
+            atr = tr_num / tr_den if tr_obs >= period else np.nan
+            plus_di = 100.0 * (p_num / p_den) / atr if p_obs >= period else np.nan
+            minus_di = 100.0 * (m_num / m_den) / atr if m_obs >= period else np.nan
+            div = plus_di + minus_di
+            if div == 0 or div != div:
+                dx = 0.0 if plus_di == plus_di else np.nan
+            else:
+                dx = 100.0 * abs(plus_di - minus_di) / div
+
+            if dx == dx:
+                x_num += dx
+                x_den += 1.0
+                x_obs += 1
+            out[t, j] = x_num / x_den if x_obs >= period else np.nan
+    return out
+
+if njit is not None:
+    _jit = njit(cache=True, nogil=True, error_model='numpy')
+    _wilder_ewm_numba = _jit(_wilder_ewm_loop)
+    _rsi_numba = _jit(_rsi_loop)
+    _adx_numba = _jit(_adx_loop)
+
+def _use_numba():
+    return BACKEND == 'numba' and njit is not None
+
+def _as_matrix(values):
+    # Series -> macierz (n, 1); kolumnowy układ pamięci dla pętli po tickerach
+    arr = values.to_numpy(dtype=np.float64)
+    return np.asfortranarray(arr.reshape(len(arr), -1))
+
+def _wrap(out, like):
+    if isinstance(like, pd.Series):
+        return pd.Series(out[:, 0], index=like.index, name=like.name)
+    return pd.DataFrame(out, index=like.index, columns=like.columns)
+
+def wilder_smooth(values, period=14):
+    """
+    Wygładzanie Wildera (RMA) dla Series lub każdej kolumny DataFrame.
+    Odpowiada ewm(alpha=1/period, min_periods=period).mean(), ale cała macierz
+    przechodzi przez jedną pętlę (skompilowaną przez Numbę, jeśli jest dostępna).
+    """
+    x = _as_matrix(values)
+    out = _wilder_ewm_numba(x, period) if _use_numba() else _wilder_ewm_numpy(x, period)
+    return _wrap(out, values)
+
+def _first_diff(values):
+    # Pierwsza różnica; w pierwszym notowaniu tickera (brak poprzedniego) wynosi 0,
+    # a tam, gdzie nie ma ceny, zostaje NaN (pomijane przez wygładzanie).
+    delta = values.diff()
+    return delta.mask(delta.isna() & values.notna(), 0.0)
+
+def rsi(close, period=RSI_PERIOD):
+    """
+    RSI Wildera dla Series lub macierzy cen zamknięcia (daty × tickery).
+    """
+    if _use_numba():
+        return _wrap(_rsi_numba(_as_matrix(close), period), close)
+
+    delta = _first_diff(close)
+    gain = delta.clip(lower=0)
+    loss = (-delta).clip(lower=0)
+    rs = wilder_smooth(gain, period) / wilder_smooth(loss, period)
+    return 100 - (100 / (1 + rs))
+
+def true_range(high, low, close):
+    """
+    True Range: max(H-L, |H-C[-1]|, |L-C[-1]|); w pierwszym notowaniu H-L.
+    """
+    prev_close = close.shift(1)
+    tr = np.fmax(np.fmax(high - low, (high - prev_close).abs()), (low - prev_close).abs())
+    return tr.where(close.notna())
+
+def directional_movement(high, low):
+    """
+    Zwraca (+DM, -DM) według definicji Wildera.
+    """
+    up = _first_diff(high)
+    down = -_first_diff(low)
+    plus_dm = up.where((up > down) & (up > 0), 0.0).where(up.notna())
+    minus_dm = down.where((down > up) & (down > 0), 0.0).where(down.notna())
+    return plus_dm, minus_dm
+
+def adx(high, low, close, period=ADX_PERIOD):
+    """
+    ADX Wildera dla Series lub macierzy (daty × tickery).
+    Wymaga cen High, Low, Close o tym samym kształcie.
+    """
+    if _use_numba():
+        return _wrap(_adx_numba(_as_matrix(high), _as_matrix(low), _as_matrix(close), period), close)
+
+    plus_dm, minus_dm = directional_movement(high, low)
+    atr = wilder_smooth(true_range(high, low, close), period)
+    plus_di = 100 * wilder_smooth(plus_dm, period) / atr
+    minus_di = 100 * wilder_smooth(minus_dm, period) / atr
+
+    # Brak ruchu w obu kierunkach (+DI + -DI = 0) traktujemy jak DX = 0
+    div = (plus_di + minus_di).replace(0, np.nan)
+    dx = (100 * (plus_di - minus_di).abs() / div).mask(div.isna() & plus_di.notna(), 0.0)
+    return wilder_smooth(dx, period)
+
+def price_fields(data, fields=('Open', 'High', 'Low', 'Close', 'Volume'), single_ticker=None):
+    """
+    Rozbija wynik yf.download(group_by='ticker') na macierze daty × tickery,
+    po jednej dla każdego pola OHLCV. Dla płaskich kolumn (jeden ticker)
+    trzeba podać jego symbol w single_ticker.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        return {f: data.xs(f, axis=1, level=1) for f in fields if f in data.columns.get_level_values(1)}
+    return {f: data[[f]].set_axis([single_ticker], axis=1) for f in fields if f in data.columns}
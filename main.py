@@ -1,15 +1,9 @@
-import yfinance as yf
-import pandas as pd
-import smtplib
 import os
 import datetime
 import sys
-from email.message import EmailMessage
 
-# --- NOWE IMPORTY ---
-import requests
-from io import StringIO 
-# --------------------
+# Ciężkie moduły (yfinance, pandas, numpy, requests, smtplib) są importowane
+# leniwie wewnątrz etapów, które ich potrzebują - patrz startup_budget.py.
 
 # Konfiguracja zmiennych środowiskowych
 EMAIL_SENDER = os.environ.get('EMAIL_SENDER')
@@ -22,6 +16,9 @@ WIKI_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
 
 # --- POPRAWIONA FUNKCJA ---
 def get_sp500_tickers():
+    from replay import http_get
+    from symbols import normalize_symbols
+    from wiki_tables import first_table
     try:
         # Udajemy przeglądarkę Chrome, żeby Wikipedia nas nie blokowała
         headers = {
@@ -29,15 +26,13 @@ def get_sp500_tickers():
         }
         
         print(f"Pobieranie listy spółek z: {WIKI_URL}")
-        response = requests.get(WIKI_URL, headers=headers)
+        response = http_get(WIKI_URL, headers=headers)
         response.raise_for_status() # Sprawdź czy nie ma błędu HTTP
         
-        # Używamy StringIO, aby pandas potraktował tekst jako plik
-        tables = pd.read_html(StringIO(response.text))
-        
-        df = tables[0]
-        tickers = df['Symbol'].tolist()
-        tickers = [ticker.replace('.', '-') for ticker in tickers]
+        # Tylko pierwsza tabela z kolumną Symbol, bez parsowania reszty strony
+        header, rows = first_table(response.text, 'Symbol')
+        tickers = [r[header.index('Symbol')] for r in rows]
+        tickers = normalize_symbols(tickers)
         print(f"Pobrano {len(tickers)} tickerów z S&P 500.")
         return tickers
     except Exception as e:
@@ -46,21 +41,25 @@ def get_sp500_tickers():
 # --------------------------
 
 def fetch_data(tickers):
+    from providers import download_frame
     print("Rozpoczynanie pobierania danych z Yahoo Finance...")
     try:
-        # group_by='ticker' jest kluczowe dla poprawnej struktury przy wielu tickerach
-        data = yf.download(tickers, period="6mo", group_by='ticker', auto_adjust=True, progress=False, threads=True)
+        # Zawsze MultiIndex (ticker, pole), niezależnie od źródła i liczby tickerów
+        data = download_frame(tickers, period="6mo")
         return data
     except Exception as e:
         print(f"Błąd podczas pobierania danych: {e}")
         sys.exit(1)
 
 def calculate_signals(data, tickers):
+    import pandas as pd
+    from profiling import profiled_items
     # --- POPRAWKA TUTAJ: Dodano puste listy [] ---
     bullish_signals = []
     bearish_signals = []
     
-    for ticker in tickers:
+    # Czas każdego tickera mierzony przy SCAN_PROFILE (profiling.py)
+    for ticker in profiled_items(tickers, 'calculate_signals'):
         try:
             # Obsługa struktury MultiIndex z yfinance
             if ticker not in data.columns.levels[0]:
@@ -103,16 +102,8 @@ def calculate_signals(data, tickers):
             
     return bullish_signals, bearish_signals
 
-def send_email_alert(bullish, bearish):
-    if not EMAIL_SENDER or not EMAIL_PASSWORD or not EMAIL_RECIPIENT:
-        print("Brak danych logowania SMTP w zmiennych środowiskowych. Pomijanie wysyłki.")
-        print(f"Znaleziono bycze: {len(bullish)}")
-        print(f"Znaleziono niedźwiedzie: {len(bearish)}")
-        return
-
-    date_str = datetime.date.today().strftime('%Y-%m-%d')
-    subject = f"Raport S&P 500 MA20/MA50 - {date_str}"
-    
+def render_report(bullish, bearish, date_str):
+    # Sam HTML raportu - send_email_alert bierze go z cache (report_cache.py), jeśli dane się nie zmieniły
     html_content = f"""
     <html>
       <body style="font-family: Arial, sans-serif;">
@@ -142,6 +133,25 @@ def send_email_alert(bullish, bearish):
       </body>
     </html>
     """
+    return html_content
+
+def send_email_alert(bullish, bearish):
+    if not EMAIL_SENDER or not EMAIL_PASSWORD or not EMAIL_RECIPIENT:
+        print("Brak danych logowania SMTP w zmiennych środowiskowych. Pomijanie wysyłki.")
+        print(f"Znaleziono bycze: {len(bullish)}")
+        print(f"Znaleziono niedźwiedzie: {len(bearish)}")
+        return
+
+    import smtplib
+    from email.message import EmailMessage
+
+    date_str = datetime.date.today().strftime('%Y-%m-%d')
+    subject = f"Raport S&P 500 MA20/MA50 - {date_str}"
+    
+    # HTML z cache, jeśli sygnały i szablon są takie same jak przy poprzednim uruchomieniu
+    from report_cache import already_sent, cached_render, content_key, mark_sent, template_version
+    key = content_key(template_version(__file__), date_str, bullish, bearish)
+    html_content = cached_render('main', key, lambda: render_report(bullish, bearish, date_str))
 
     msg = EmailMessage()
     # --- POPRAWKA TUTAJ: Ustawianie nagłówków zamiast nadpisywania obiektu ---
@@ -152,27 +162,40 @@ def send_email_alert(bullish, bearish):
     msg.set_content("Twoja skrzynka nie obsługuje HTML.")
     msg.add_alternative(html_content, subtype='html')
 
+    # Ta sama wiadomość do tego samego odbiorcy nie jest wysyłana drugi raz
+    sent_key = content_key(EMAIL_RECIPIENT, subject, html_content)
+    if already_sent(sent_key):
+        print("Ten raport został już wysłany - pomijam wysyłkę.")
+        return
+
     try:
         with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as smtp:
             smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
             smtp.send_message(msg)
+            mark_sent(sent_key)
             print("E-mail został wysłany pomyślnie.")
     except Exception as e:
         print(f"Błąd wysyłki e-maila: {e}")
 
 # --- POPRAWKA TUTAJ: Definicja funkcji main ---
+def process_chunk(tickers):
+    data = fetch_data(tickers)
+    if data is None or data.empty:
+        print("Nie udało się pobrać danych giełdowych.")
+        return [], []
+    # Tickery z błędnymi danymi (zera, zamrożona cena, skoki) odpadają przed analizą
+    from validation import validate_download
+    return calculate_signals(validate_download(data), tickers)
+
 def main():
     tickers = get_sp500_tickers()
     if not tickers:
         print("Nie udało się pobrać tickerów.")
         return
 
-    data = fetch_data(tickers)
-    if data is None or data.empty:
-        print("Nie udało się pobrać danych giełdowych.")
-        return
-
-    bullish, bearish = calculate_signals(data, tickers)
+    # Przy ustawionym SCAN_MEMORY_MB dane są pobierane i analizowane paczkami
+    from scanner import scan_in_chunks
+    bullish, bearish = scan_in_chunks(tickers, process_chunk)
     
     print(f"Podsumowanie: {len(bullish)} Golden Cross, {len(bearish)} Death Cross.")
     
@@ -181,4 +204,5 @@ def main():
     send_email_alert(bullish, bearish)
 
 if __name__ == "__main__":
-    main()
+    from profiling import run_profiled
+    run_profiled(main)
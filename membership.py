@@ -0,0 +1,137 @@
+import os
+import sys
+
+# --- SKŁAD INDEKSÓW W CZASIE (POINT-IN-TIME) ---
+# Wikipedia zna tylko dzisiejszy skład indeksu, więc analiza historyczna
+# na dzisiejszej liście ma błąd przeżywalności (survivorship bias).
+# Tu trzymamy przedziały przynależności [od, do) dla każdego symbolu,
+# zbudowane z lokalnej tabeli zmian, i odpowiadamy na pytanie
+# "skład indeksu X w dniu D" bez odtwarzania go za każdym razem od zera.
+
+from scanner import DATA_DIR
+
+CHANGES_FILE = os.path.join(DATA_DIR, 'membership_changes.csv')
+# Przedział otwarty (spółka nadal w indeksie) kończy się w "nieskończoności"
+OPEN_END = '2262-04-11'
+
+def _days(dates):
+    # Daty -> liczba dni od epoki (int64), skalar albo wektor
+    import numpy as np
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+def intervals_from_changes(changes, current_members, as_of=None):
+    """
+    Odtwarza przedziały przynależności idąc od dzisiejszego składu wstecz.
+    changes: DataFrame z kolumnami date, index, added, removed (jedna zmiana
+             na wiersz, puste pole = brak), np. tabela "Selected changes" z Wikipedii.
+    current_members: {indeks: [symbole]} - skład na dzień as_of (domyślnie dziś).
+    Zwraca DataFrame: symbol, index, start, end.
+    """
+    import pandas as pd
+    from symbols import normalize_symbol
+    changes = changes.assign(date=pd.to_datetime(changes['date'])).sort_values('date', ascending=False)
+    open_end = pd.Timestamp(OPEN_END)
+    rows = []
+    for index_name, symbols in current_members.items():
+        # symbol -> koniec przedziału, który jeszcze nie ma znanego początku
+        pending = {s: open_end for s in symbols}
+        for ch in changes[changes['index'] == index_name].itertuples():
+            if as_of is not None and ch.date > pd.Timestamp(as_of):
+                continue
+            # Tabela zmian z Wikipedii ma formy typu BRK.B - sprowadzamy do formy Yahoo
+            added = normalize_symbol(ch.added) if isinstance(ch.added, str) and ch.added else None
+            removed = normalize_symbol(ch.removed) if isinstance(ch.removed, str) and ch.removed else None
+            if added:
+                end = pending.pop(added, None)
+                if end is not None:
+                    rows.append((added, index_name, ch.date, end))
+            if removed and removed not in pending:
+                pending[removed] = ch.date
+        # Członkowie bez znanej daty dołączenia - od początku historii
+        rows.extend((s, index_name, pd.Timestamp('1900-01-01'), end) for s, end in pending.items())
+    return pd.DataFrame(rows, columns=['symbol', 'index', 'start', 'end'])
+
+def build_interval_index(intervals):
+    """
+    Indeks przedziałów: {indeks: {'symbols', 'ids', 'start', 'end'}} z tablicami
+    NumPy posortowanymi po początku przedziału (ids z rejestru symbols.py).
+    """
+    from symbols import symbol_ids
+    store = {}
+    for index_name, df in intervals.groupby('index'):
+        df = df.sort_values('start')
+        store[index_name] = {
+            'symbols': df['symbol'].to_numpy(dtype=object),
+            'ids': symbol_ids(df['symbol'].tolist()),
+            'start': _days(df['start'].to_numpy()),
+            'end': _days(df['end'].to_numpy()),
+        }
+    return store
+
+def members_on(store, index_name, date):
+    """
+    Skład indeksu w dniu date (lista symboli). Jedno porównanie wektorowe
+    na przedziałach indeksu; przedziały zaczynające się po date są pomijane
+    przez wyszukiwanie binarne.
+    """
+    import numpy as np
+    idx = store.get(index_name)
+    if idx is None:
+        return []
+    d = _days(date)
+    n = np.searchsorted(idx['start'], d, side='right')
+    hit = idx['end'][:n] > d
+    return list(idx['symbols'][:n][hit])
+
+def membership_mask(store, index_name, dates, columns):
+    """
+    Macierz bool daty × tickery (zgodna z macierzą cen, daty rosnąco): True,
+    gdy ticker należał do indeksu w danym dniu. Przedziały są dopasowywane do
+    kolumn po identyfikatorach int (BRK.B z tabeli zmian = kolumna BRK-B),
+    a każdy przedział to jeden zakres wierszy z wyszukiwania binarnego.
+    """
+    import numpy as np
+    import pandas as pd
+    from symbols import UNKNOWN_ID, symbol_ids
+    mask = np.zeros((len(dates), len(columns)), dtype=bool)
+    idx = store.get(index_name)
+    if idx is not None:
+        col_of = {sid: j for j, sid in enumerate(symbol_ids(list(columns), add=False)) if sid != UNKNOWN_ID}
+        # Daty rosnąco: przedział [start, end) to ciągły zakres wierszy macierzy
+        d = _days(pd.DatetimeIndex(dates).values)
+        first, stop = np.searchsorted(d, idx['start']), np.searchsorted(d, idx['end'])
+        for sid, r0, r1 in zip(idx['ids'], first, stop):
+            j = col_of.get(sid)
+            if j is not None:
+                mask[r0:r1, j] = True
+    return pd.DataFrame(mask, index=dates, columns=columns)
+
+def load_membership(current_members, path=CHANGES_FILE):
+    """
+    Wczytuje lokalną tabelę zmian i buduje indeks przedziałów.
+    Zwraca None, jeśli tabeli nie ma (wtedy używany jest dzisiejszy skład).
+    """
+    import pandas as pd
+    if not os.path.exists(path):
+        return None
+    from symbols import save_registry
+    changes = pd.read_csv(path, dtype={'added': str, 'removed': str})
+    store = build_interval_index(intervals_from_changes(changes, current_members))
+    # Spółki usunięte z indeksu dostają identyfikatory przy pierwszym odczycie tabeli
+    save_registry()
+    return store
+
+if __name__ == "__main__":
+    # Podgląd: python membership.py "S&P 600 (Small Cap)" 2020-03-16
+    if len(sys.argv) != 3:
+        print('Użycie: python membership.py "<indeks>" <RRRR-MM-DD>')
+        sys.exit(1)
+    from SP500_SP600_scan import SOURCES
+    from universe import load_universe
+    _, members = load_universe(SOURCES)
+    store = load_membership(members)
+    if store is None:
+        print(f"Brak tabeli zmian: {CHANGES_FILE}")
+        sys.exit(1)
+    result = members_on(store, sys.argv[1], sys.argv[2])
+    print(f"{sys.argv[1]} w dniu {sys.argv[2]}: {len(result)} spółek")
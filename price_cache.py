@@ -0,0 +1,237 @@
+import os
+import time
+
+# --- LOKALNY CACHE CEN Z KOREKTĄ O ZDARZENIA KORPORACYJNE ---
+# Cache trzyma ceny "surowe" z Yahoo (auto_adjust=False) i osobno współczynnik
+# korekty Factor = Adj Close / Close. Ceny skorygowane liczone są przy odczycie
+# (surowe × Factor), więc nowa dywidenda nie unieważnia całej historii.
+#
+# Przy każdym dociągnięciu nowych sesji pobieramy kilka dni zakładki razem
+# z kolumnami zdarzeń z Yahoo (actions=True: Stock Splits, Dividends), które
+# też trzymamy w cache. Zdarzenie, którego cache jeszcze nie zna:
+#   - split        -> przeliczamy historię OHLC/Volume sprzed daty splitu,
+#   - dywidenda    -> skalujemy historię Factor sprzed daty dywidendy.
+# Przeliczane są tylko tickery, których to dotyczy. Różnice samych cen na
+# zakładce (np. ostatnia świeca zapisana w trakcie sesji) nie są zdarzeniem -
+# wiersze zakładki po prostu zastępują te z cache.
+#
+# Każdy wpis pamięta okres, w jakim był pobrany w całości (attrs['period']).
+# Wpis płytszy niż okres żądany teraz (np. z watchlisty, 1y, a skan
+# miesięczny potrzebuje 5y) traktowany jest jak brakujący i pobierany
+# od nowa - dociąganie od ostatniej sesji nie pogłębia historii wstecz.
+#
+# Watchlista działa wiele razy dziennie, także w trakcie sesji. Świeca
+# trwającej sesji trafia do wyniku, ale nie do pliku cache, a wpis jest
+# świeży tylko wtedy, gdy zapisano go po zamknięciu ostatniej sesji
+# (trading_calendar.last_closed_session) - w trakcie sesji każde
+# uruchomienie dociąga bieżącą świecę z Yahoo.
+
+from scanner import DATA_DIR
+
+CACHE_DIR = os.path.join(DATA_DIR, 'prices')
+CACHE_MAX_AGE_HOURS = float(os.environ.get('PRICE_CACHE_MAX_AGE_HOURS', 12))
+OVERLAP_DAYS = 10                    # dni kalendarzowe zakładki przy dociąganiu
+RATIO_TOLERANCE = 1e-4               # różnica względna uznawana za zdarzenie
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+ACTION_COLUMNS = ['Stock Splits', 'Dividends']
+
+def _path(ticker):
+    return os.path.join(CACHE_DIR, f"{ticker}.pkl")
+
+def read_cached(ticker):
+    import pandas as pd
+    try:
+        return pd.read_pickle(_path(ticker))
+    except (OSError, ValueError, EOFError):
+        return None
+
+def is_fresh(ticker, max_age_hours=CACHE_MAX_AGE_HOURS, fresh_after=None):
+    # Świeży = zapisany niedawno i po chwili fresh_after (epoch; domyślnie _fresh_after())
+    try:
+        mtime = os.path.getmtime(_path(ticker))
+    except OSError:
+        return False
+    if fresh_after is None:
+        fresh_after = _fresh_after()
+    return time.time() - mtime < max_age_hours * 3600 and mtime >= fresh_after
+
+def _fresh_after():
+    # Zapis sprzed zamknięcia ostatniej sesji jest nieaktualny; w trakcie sesji każdy
+    # (bieżącej świecy nie ma w pliku, więc trzeba ją dociągnąć)
+    from trading_calendar import last_closed_session, session_in_progress
+    if session_in_progress():
+        return float('inf')
+    return last_closed_session()[1].timestamp()
+
+def write_cached(ticker, df, last_day=None):
+    # Tylko zakończone sesje (do last_day) - świeca z trwającej sesji nie jest ostateczna
+    from trading_calendar import last_closed_session
+    day = last_day if last_day is not None else last_closed_session()[0]
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    df[df.index <= day].to_pickle(_path(ticker))
+
+def _raw_frame(data, ticker, single):
+    # Wynik yf.download(auto_adjust=False) -> surowe OHLCV + Factor dla tickera
+    df = data if single else data[ticker]
+    df = df.dropna(subset=['Close'])
+    out = df[PRICE_COLUMNS + ['Volume']].astype(float).copy()
+    out['Factor'] = (df['Adj Close'] / df['Close']).astype(float)
+    for col in ACTION_COLUMNS:
+        if col in df.columns:
+            out[col] = df[col].fillna(0.0).astype(float)
+    return out
+
+def _new_events(cached, fresh, column):
+    # Niezerowe zdarzenia z zakładki, których cache nie ma zapisanych (data -> wartość).
+    # Wpisy sprzed zapisywania zdarzeń: nowe tylko te po ostatniej sesji w cache.
+    import numpy as np
+    import pandas as pd
+    if column not in fresh.columns:
+        return pd.Series(dtype=float)
+    events = fresh.loc[fresh[column].fillna(0.0) != 0, column]
+    if column in cached.columns:
+        seen = cached[column].reindex(events.index).fillna(0.0).to_numpy()
+        return events[~np.isclose(seen, events.to_numpy(), rtol=RATIO_TOLERANCE)]
+    return events[events.index > cached.index[-1]]
+
+def merge_update(cached, fresh):
+    """
+    Dokleja nowe sesje do cache tickera. Nowy split (Stock Splits) przelicza
+    OHLC/Volume sprzed jego daty, nowa dywidenda (Dividends) - Factor sprzed
+    jej daty. Zwraca (nowa_ramka, lista_wykrytych_zdarzeń).
+    """
+    import pandas as pd
+    events = []
+    for day, ratio in _new_events(cached, fresh, 'Stock Splits').items():
+        before = cached.index < day
+        cached = cached.copy()
+        cached.loc[before, PRICE_COLUMNS] /= ratio
+        cached.loc[before, 'Volume'] *= ratio
+        events.append(f"split {ratio:g}:1 ({day:%Y-%m-%d})")
+    dividends = _new_events(cached, fresh, 'Dividends')
+    if len(dividends):
+        # Zachowane wiersze cache leżą przed zakładką, więc jeden łączny współczynnik:
+        # z Yahoo na wspólnej sesji sprzed pierwszej dywidendy, a bez niej -
+        # wzorem Yahoo, iloczyn (1 - D / Close sesji poprzedniej)
+        before = cached.index < dividends.index[0]
+        common = cached.index[before].intersection(fresh.index)
+        if len(common):
+            ratio = fresh.at[common[0], 'Factor'] / cached.at[common[0], 'Factor']
+        else:
+            ratio = 1.0
+            for day, amount in dividends.items():
+                prev = cached.loc[cached.index < day, 'Close']
+                ratio *= 1 - amount / prev.iloc[-1] if len(prev) else 1.0
+        cached = cached.copy()
+        cached.loc[before, 'Factor'] *= ratio
+        events.append(f"dywidenda {', '.join(f'{a:g} ({d:%Y-%m-%d})' for d, a in dividends.items())} (Factor x{ratio:.6f})")
+    merged = pd.concat([cached[~cached.index.isin(fresh.index)], fresh]).sort_index()
+    # concat gubi attrs - głębokość pobrania zostaje ta sama
+    merged.attrs = dict(cached.attrs)
+    return merged, events
+
+def _download(tickers, **kwargs):
+    from replay import download
+    return download(tickers, group_by='ticker', auto_adjust=False, actions=True,
+                       progress=False, threads=True, **kwargs)
+
+def _depth(cached):
+    # Sesje, jakie miał okres pełnego pobrania wpisu; stare wpisy bez znacznika - tyle, ile mają wierszy
+    from scanner import SESSIONS_PER_PERIOD
+    return max(SESSIONS_PER_PERIOD.get(cached.attrs.get('period'), 0), len(cached))
+
+def update_cache(tickers, period='1y'):
+    """
+    Uzupełnia cache dla tickerów: brakujące i zbyt płytkie (pobrane wcześniej
+    krótszym okresem niż period) pobiera w całości, nieaktualne dociąga od
+    ostatniej zapisanej sesji minus zakładka.
+    Zwraca {ticker: surowa ramka} dla wszystkich dostępnych tickerów.
+    """
+    import pandas as pd
+    from scanner import SESSIONS_PER_PERIOD
+    from trading_calendar import last_closed_session
+    sessions = SESSIONS_PER_PERIOD.get(period, 252)
+    last_day, fresh_after = last_closed_session()[0], _fresh_after()
+    frames, missing, stale = {}, [], []
+    for t in tickers:
+        cached = read_cached(t)
+        if cached is None or cached.empty or _depth(cached) < sessions:
+            missing.append(t)
+        else:
+            frames[t] = cached
+            if not is_fresh(t, fresh_after=fresh_after):
+                stale.append(t)
+
+    def fetch(batch, **kwargs):
+        if not batch:
+            return {}
+        data = _download(batch, **kwargs)
+        if data is None or data.empty:
+            return {}
+        single = not isinstance(data.columns, pd.MultiIndex)
+        out = {}
+        for t in batch:
+            try:
+                if single or t in data.columns.levels[0]:
+                    out[t] = _raw_frame(data, t, single)
+                    if 'period' in kwargs:
+                        out[t].attrs['period'] = kwargs['period']
+            except Exception:
+                continue
+        return out
+
+    fetched = fetch(missing, period=period)
+    for t, df in fetched.items():
+        frames[t] = df
+        write_cached(t, df, last_day)
+    # Nieudane pogłębienie: zostaje płytszy wpis (i jego dociąganie), a nie nic
+    for t in missing:
+        if t not in fetched:
+            cached = read_cached(t)
+            if cached is not None and not cached.empty:
+                frames[t] = cached
+                if not is_fresh(t, fresh_after=fresh_after):
+                    stale.append(t)
+
+    if stale:
+        start = min(frames[t].index[-1] for t in stale) - pd.Timedelta(days=OVERLAP_DAYS)
+        adjusted = 0
+        for t, fresh in fetch(stale, start=start.strftime('%Y-%m-%d')).items():
+            merged, events = merge_update(frames[t], fresh)
+            if events:
+                adjusted += 1
+                print(f"{t}: wykryto {', '.join(events)} - przeliczono historię w cache.")
+            frames[t] = merged
+            write_cached(t, merged, last_day)
+        print(f"Cache cen: {len(stale)} tickerów dociągniętych, {adjusted} z korektą historii, "
+              f"{len(missing)} pobranych w całości.")
+    return frames
+
+def adjusted_fields(frames, sessions=None):
+    """
+    Macierze daty × tickery (jak indicators.price_fields) z cenami skorygowanymi
+    o splity i dywidendy, liczonymi przy odczycie: OHLC × Factor.
+    sessions ogranicza wynik do ostatnich N sesji.
+    """
+    import pandas as pd
+    if not frames:
+        return {}
+    wide = pd.concat(frames, axis=1)
+    px = {f: wide.xs(f, axis=1, level=1) for f in PRICE_COLUMNS + ['Volume', 'Factor']}
+    factor = px.pop('Factor')
+    for f in PRICE_COLUMNS:
+        px[f] = px[f] * factor
+    if sessions:
+        px = {f: m.iloc[-sessions:] for f, m in px.items()}
+    return px
+
+def cached_prices(tickers, period='7mo'):
+    """
+    Skorygowane macierze cen dla tickerów z lokalnego cache (z dociągnięciem
+    brakujących sesji). Odpowiednik yf.download(auto_adjust=True) + price_fields.
+    """
+    from scanner import SESSIONS_PER_PERIOD
+    sessions = SESSIONS_PER_PERIOD.get(period, 252)
+    # Pierwsze pobranie co najmniej roczne, żeby cache starczył też na dłuższe okna
+    frames = update_cache(tickers, period=period if sessions > 252 else '1y')
+    return adjusted_fields(frames, sessions=sessions)
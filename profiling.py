@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# --- PROFILOWANIE SKANÓW ---
+# Podejrzewamy, że czas pętli po tickerach (calculate_signals, process_batch)
+# zjada narzut pandas (wiersze df.iloc[-1] jako Series, wstawianie kolumn,
+# pd.isna na skalarach), a nie arytmetyka. Zamiast zgadywać, skan można
+# uruchomić z SCAN_PROFILE (lista po przecinku):
+#   cpu    - cProfile całego uruchomienia (+ czas własny wg pakietu: pandas/numpy/...),
+#   sample - próbkowanie pyinstrument (opcjonalna zależność),
+#   alloc  - tracemalloc: miejsca z największą liczbą i rozmiarem alokacji,
+#   items  - tylko czasy pojedynczych tickerów/paczek (włączone przy każdym trybie).
+# Raport trafia do PROFILE_DIR (artefakt w workflow). Bez SCAN_PROFILE
+# profiled_items zwraca iterowaną kolekcję bez zmian - zero narzutu.
+
+from scanner import DATA_DIR
+
+PROFILE_MODES = {m.strip().lower() for m in os.environ.get('SCAN_PROFILE', '').split(',') if m.strip()}
+if 'all' in PROFILE_MODES:
+    PROFILE_MODES |= {'cpu', 'alloc'}
+PROFILE_DIR = os.environ.get('SCAN_PROFILE_DIR', os.path.join(DATA_DIR, 'profile'))
+PROFILE_TOP = 30
+
+# Pomiary w tym procesie: {nazwa pętli: [(element, ns, bajty)]}
+_timings = {}
+
+def _traced():
+    import tracemalloc
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+@contextmanager
+def section(name, item):
+    """
+    Mierzy jeden przebieg (ticker, paczka) pętli name. Bez SCAN_PROFILE nic nie robi.
+    """
+    if not PROFILE_MODES:
+        yield
+        return
+    m0, t0 = _traced(), time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _timings.setdefault(name, []).append((item, time.perf_counter_ns() - t0, _traced() - m0))
+
+def profiled_items(iterable, name):
+    """
+    Iteruje jak zwykle, a w trybie profilowania mierzy czas ciała pętli dla każdego elementu.
+    """
+    if not PROFILE_MODES:
+        return iterable
+    def gen():
+        for item in iterable:
+            with section(name, item):
+                yield item
+    return gen()
+
+def _histogram(ns):
+    # Kubełki potęg dwójki w mikrosekundach
+    import numpy as np
+    us = np.maximum(np.asarray(ns, dtype=float) / 1000, 1)
+    buckets = np.floor(np.log2(us)).astype(int)
+    lines = []
+    for b in range(buckets.min(), buckets.max() + 1):
+        n = int((buckets == b).sum())
+        lines.append(f"    {2 ** b:>9} - {2 ** (b + 1):<9} us {n:6d} {'#' * min(60, n)}")
+    return lines
+
+def timings_report():
+    """
+    Tekst: dla każdej mierzonej pętli percentyle czasu, histogram i najwolniejsze elementy.
+    """
+    import numpy as np
+    lines = []
+    for name, rows in _timings.items():
+        ns = np.array([r[1] for r in rows], dtype=float)
+        mem = np.array([r[2] for r in rows], dtype=float)
+        p50, p90, p99 = np.percentile(ns, [50, 90, 99]) / 1e6
+        lines.append(f"{name}: {len(rows)} przebiegów, razem {ns.sum() / 1e9:.2f} s, "
+                     f"p50 {p50:.2f} ms, p90 {p90:.2f} ms, p99 {p99:.2f} ms, max {ns.max() / 1e6:.2f} ms")
+        if 'alloc' in PROFILE_MODES:
+            lines.append(f"  przyrost pamięci na przebieg: mediana {np.median(mem) / 1024:.1f} KB, max {mem.max() / 1024:.1f} KB")
+        lines += _histogram(ns)
+        slowest = sorted(rows, key=lambda r: -r[1])[:10]
+        lines.append("  najwolniejsze: " + ", ".join(f"{r[0]} {r[1] / 1e6:.1f} ms" for r in slowest))
+        lines.append("")
+    return lines
+
+def _package(filename):
+    # pandas/numpy/... z site-packages, reszta to kod skanera lub biblioteka standardowa
+    parts = filename.replace('\\', '/').split('/')
+    if 'site-packages' in parts:
+        return parts[parts.index('site-packages') + 1].split('.')[0]
+    if filename.startswith('~') or filename.startswith('<'):
+        return 'wbudowane'
+    return 'skaner' if os.path.dirname(os.path.abspath(filename)) == os.path.dirname(os.path.abspath(__file__)) else 'stdlib'
+
+def cpu_report(profiler, path):
+    """
+    Zapisuje statystyki cProfile (path.prof, do snakeviz/pstats) i zwraca tekst:
+    czas własny wg pakietu oraz funkcje z największym czasem łącznym i własnym.
+    """
+    import io
+    import pstats
+    profiler.dump_stats(f"{path}.prof")
+    stats = pstats.Stats(profiler)
+    by_package = {}
+    for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+        pkg = _package(filename)
+        by_package[pkg] = by_package.get(pkg, 0.0) + tottime
+    total = sum(by_package.values()) or 1.0
+    lines = ["Czas własny wg pakietu:"]
+    lines += [f"  {pkg:<14} {t:8.2f} s  {t / total:6.1%}" for pkg, t in sorted(by_package.items(), key=lambda kv: -kv[1])]
+    for order in ('cumulative', 'tottime'):
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats(order).print_stats(PROFILE_TOP)
+        lines += ["", f"Najwięcej czasu ({order}):", out.getvalue().split('\n', 6)[-1].rstrip()]
+    return lines
+
+def alloc_report(snapshot):
+    """
+    Miejsca alokacji z tracemalloc: największy rozmiar i największa liczba bloków.
+    """
+    lines = []
+    stats = snapshot.statistics('lineno')
+    for title, key in (("Alokacje wg rozmiaru:", lambda s: -s.size), ("Alokacje wg liczby bloków:", lambda s: -s.count)):
+        lines.append(title)
+        for s in sorted(stats, key=key)[:PROFILE_TOP]:
+            frame = s.traceback[0]
+            lines.append(f"  {s.size / 1024:10.1f} KB {s.count:9d} bl.  {frame.filename}:{frame.lineno}")
+        lines.append("")
+    return lines
+
+def run_profiled(main, name=None):
+    """
+    Uruchamia main() z profilowaniem wg SCAN_PROFILE i zapisuje raport
+    PROFILE_DIR/<skrypt>-<czas>.txt (+ .prof dla cpu, .html dla sample).
+    Bez SCAN_PROFILE to zwykłe main().
+    """
+    if not PROFILE_MODES:
+        return main()
+    name = name or os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'scan'
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    profiler = sampler = None
+    if 'alloc' in PROFILE_MODES:
+        import tracemalloc
+        tracemalloc.start()
+    if 'sample' in PROFILE_MODES:
+        try:
+            from pyinstrument import Profiler
+            sampler = Profiler()
+            sampler.start()
+        except ImportError:
+            print("Tryb sample wymaga pyinstrument (pip install pyinstrument) - pomijam.")
+    if 'cpu' in PROFILE_MODES:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        return main()
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        lines = [f"Profil {name}: {elapsed:.2f} s, tryby: {', '.join(sorted(PROFILE_MODES))}", ""]
+        lines += timings_report()
+        if 'alloc' in PROFILE_MODES:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            lines += [f"Pamięć śledzona: bieżąca {current / 2**20:.1f} MB, szczyt {peak / 2**20:.1f} MB", ""]
+            lines += alloc_report(tracemalloc.take_snapshot())
+            tracemalloc.stop()
+        if profiler:
+            lines += cpu_report(profiler, path)
+        if sampler:
+            with open(f"{path}.html", 'w') as f:
+                f.write(sampler.output_html())
+        with open(f"{path}.txt", 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"Profil zapisany: {path}.txt")
@@ -0,0 +1,181 @@
+import os
+
+# --- ŹRÓDŁA DANYCH CENOWYCH ---
+# Skanery dostają ceny zawsze w tej samej postaci: słownik macierzy
+# daty × tickery dla pól OHLCV (jak indicators.price_fields), z cenami
+# skorygowanymi o splity i dywidendy. Skąd pochodzą, decyduje PRICE_PROVIDER:
+#   yahoo - yf.download (przez replay.download),
+#   cache - lokalny cache z korektą zdarzeń korporacyjnych (price_cache.py),
+#   local - pliki CSV/Parquet w PRICE_DIR (np. licencjonowane pliki EOD):
+#           jeden plik na ticker (AAPL.csv, BRK.B.parquet) albo pliki "długie"
+#           z kolumną symbol/ticker (jeden wiersz = ticker × dzień).
+# Osobliwości yf.download (MultiIndex vs płaskie kolumny dla jednego tickera)
+# obsługiwane są tylko tutaj.
+
+from scanner import DATA_DIR
+
+PRICE_PROVIDER = os.environ.get('PRICE_PROVIDER') or ('cache' if os.environ.get('SCAN_PRICE_CACHE') == '1' else 'yahoo')
+# Źródła z historią na dysku: dłuższe okno (np. 5y dla świec miesięcznych) nie kosztuje sieci
+LOCAL_PROVIDERS = ('cache', 'local')
+PRICE_DIR = os.environ.get('PRICE_DIR', os.path.join(DATA_DIR, 'eod'))
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+LOCAL_EXTENSIONS = ('.csv', '.csv.gz', '.parquet', '.pq')
+# Nazwy kolumn spotykane w plikach dostawców -> nazwy pól
+COLUMN_ALIASES = {
+    'date': 'Date', 'datetime': 'Date', 'timestamp': 'Date',
+    'symbol': 'Symbol', 'ticker': 'Symbol',
+    'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume',
+    'adj close': 'Adj Close', 'adj_close': 'Adj Close', 'adjclose': 'Adj Close', 'adjusted close': 'Adj Close',
+}
+
+# Pliki "długie" wczytane w tym procesie: {ścieżka: {pole: macierz}}
+_long_files = {}
+# Podział katalogów na pliki na ticker i długie (raz na proces): {katalog: (per_ticker, long_files)}
+_dir_listings = {}
+
+def _sessions(period):
+    from scanner import SESSIONS_PER_PERIOD
+    return SESSIONS_PER_PERIOD.get(period, 252)
+
+def yahoo_prices(tickers, period='7mo'):
+    from indicators import price_fields
+    from replay import download
+    data = download(tickers, period=period, group_by='ticker', auto_adjust=True, progress=False)
+    if data is None or data.empty:
+        return {}
+    return price_fields(data, single_ticker=tickers[0])
+
+def cache_prices(tickers, period='7mo'):
+    from price_cache import cached_prices
+    return cached_prices(tickers, period=period)
+
+def _read_table(path):
+    import pandas as pd
+    if path.endswith(('.parquet', '.pq')):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), c))
+    if 'Date' not in df.columns:
+        df = df.rename(columns={df.columns[0]: 'Date'})
+    dates = pd.to_datetime(df['Date'])
+    # Indeks bez strefy czasowej, jak w yf.download dla danych dziennych
+    df['Date'] = dates.dt.tz_localize(None) if dates.dt.tz is not None else dates
+    return df
+
+def _adjust(df):
+    # Jak auto_adjust=True: OHLC × (Adj Close / Close), gdy plik ma Adj Close
+    if 'Adj Close' in df.columns:
+        factor = (df['Adj Close'] / df['Close']).where(df['Close'] > 0, 1.0)
+        for f in ('Open', 'High', 'Low', 'Close'):
+            df[f] = df[f] * factor
+    return df
+
+def _long_matrices(path):
+    # Cały plik długi zamieniany na macierze raz na proces
+    if path not in _long_files:
+        from symbols import normalize_symbols
+        df = _adjust(_read_table(path))
+        df['Symbol'] = normalize_symbols(df['Symbol'])
+        wide = df.pivot_table(index='Date', columns='Symbol', values=[f for f in FIELDS if f in df.columns],
+                              aggfunc='last').sort_index()
+        _long_files[path] = {f: wide[f] for f in FIELDS if f in wide.columns.get_level_values(0)}
+    return _long_files[path]
+
+def local_files(price_dir=PRICE_DIR):
+    """
+    Pliki w katalogu dostawcy: ({ticker: ścieżka} dla plików na ticker, [pliki długie]).
+    Plik jest "długi", jeśli ma kolumnę symbol/ticker. Katalog jest listowany
+    (i nagłówki plików czytane) raz na proces - kolejne paczki biorą wynik z pamięci.
+    """
+    key = os.path.abspath(price_dir)
+    if key not in _dir_listings:
+        _dir_listings[key] = _classify_files(price_dir)
+    return _dir_listings[key]
+
+def _classify_files(price_dir):
+    import pandas as pd
+    from symbols import normalize_symbol
+    per_ticker, long_files = {}, []
+    if not os.path.isdir(price_dir):
+        return per_ticker, long_files
+    for name in sorted(os.listdir(price_dir)):
+        path = os.path.join(price_dir, name)
+        lower = name.lower()
+        if not lower.endswith(LOCAL_EXTENSIONS) or not os.path.isfile(path):
+            continue
+        stem = name[:-len(next(e for e in LOCAL_EXTENSIONS if lower.endswith(e)))]
+        if lower.endswith(('.parquet', '.pq')):
+            columns = _parquet_columns(path)
+        else:
+            columns = pd.read_csv(path, nrows=0).columns
+        if any(COLUMN_ALIASES.get(str(c).strip().lower()) == 'Symbol' for c in columns):
+            long_files.append(path)
+        else:
+            per_ticker[normalize_symbol(stem)] = path
+    return per_ticker, long_files
+
+def _parquet_columns(path):
+    # Parquet wymaga pyarrow (opcjonalna zależność, tylko dla PRICE_PROVIDER=local)
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(f"Do odczytu {path} potrzebny jest pyarrow (pip install pyarrow)") from None
+    return pq.read_schema(path).names
+
+def local_prices(tickers, period='7mo', price_dir=PRICE_DIR):
+    """
+    Ceny z lokalnych plików. Pliki długie wczytywane są raz na proces
+    (kolejne paczki to tylko wycinki kolumn), pliki na ticker - tylko dla
+    tickerów z paczki.
+    """
+    import pandas as pd
+    from symbols import normalize_symbol
+    per_ticker, long_files = local_files(price_dir)
+    wanted = {normalize_symbol(t): t for t in tickers}
+    parts = {f: [] for f in FIELDS}
+    for path in long_files:
+        matrices = _long_matrices(path)
+        for f, m in matrices.items():
+            cols = [s for s in wanted if s in m.columns]
+            if cols:
+                parts[f].append(m[cols].rename(columns=wanted))
+    for symbol, ticker in wanted.items():
+        if symbol in per_ticker:
+            df = _adjust(_read_table(per_ticker[symbol])).set_index('Date').sort_index()
+            for f in FIELDS:
+                if f in df.columns:
+                    parts[f].append(df[[f]].set_axis([ticker], axis=1))
+    px = {}
+    for f, frames in parts.items():
+        if frames:
+            m = pd.concat(frames, axis=1).sort_index()
+            # Ten sam ticker w kilku plikach - wygrywa pierwszy; kolejność jak w zapytaniu
+            m = m.loc[:, ~m.columns.duplicated()]
+            px[f] = m[[t for t in tickers if t in m.columns]].astype(float).iloc[-_sessions(period):]
+    return px
+
+PROVIDERS = {'yahoo': yahoo_prices, 'cache': cache_prices, 'local': local_prices}
+
+def get_prices(tickers, period='7mo', provider=None):
+    """
+    Macierze cen (daty × tickery, pola OHLCV) dla tickerów z wybranego źródła.
+    Pusty słownik, gdy źródło nic nie zwróciło.
+    """
+    name = provider or PRICE_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Nieznane źródło cen: {name} (dostępne: {', '.join(PROVIDERS)})")
+    return PROVIDERS[name](list(tickers), period)
+
+def download_frame(tickers, period='6mo', provider=None):
+    """
+    To samo w kształcie yf.download(group_by='ticker') - zawsze z MultiIndex
+    (ticker, pole), także dla jednego tickera - dla skryptów z pętlą po tickerach.
+    """
+    import pandas as pd
+    px = get_prices(tickers, period, provider)
+    if not px:
+        return pd.DataFrame(columns=pd.MultiIndex.from_product([[], FIELDS]))
+    frame = pd.concat(px, axis=1).swaplevel(0, 1, axis=1)
+    tickers_in = list(dict.fromkeys(frame.columns.get_level_values(0)))
+    return frame.reindex(columns=pd.MultiIndex.from_product([tickers_in, [f for f in FIELDS if f in px]]))
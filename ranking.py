@@ -0,0 +1,82 @@
+# --- RANKING SIŁY RELATYWNEJ (RS) ---
+# Stopy zwrotu 1/3/6 miesięcy i ich rangi percentylowe liczone przekrojowo
+# dla całego uniwersum naraz (bez pętli po tickerach). Ta sama funkcja działa
+# dla jednej sesji (raport) i dla wszystkich dat (backtest).
+
+RS_WINDOWS = {'ret_1m': 21, 'ret_3m': 63, 'ret_6m': 126}
+# Wagi składowych w ocenie łącznej - najnowszy kwartał liczy się najbardziej
+RS_WEIGHTS = {'ret_1m': 0.25, 'ret_3m': 0.40, 'ret_6m': 0.35}
+
+def trailing_returns(close, pos, windows=RS_WINDOWS):
+    """
+    Stopy zwrotu kończące się na sesji pos[j] dla każdej kolumny j macierzy cen.
+    Gdy historia jest za krótka, wynik to NaN. Zwraca {nazwa: wektor}.
+    """
+    import numpy as np
+    values = close.to_numpy(dtype=float)
+    cols = np.arange(values.shape[1])
+    last = values[np.maximum(pos, 0), cols]
+    out = {}
+    for name, window in windows.items():
+        start = pos - window
+        base = values[np.maximum(start, 0), cols]
+        out[name] = np.where((pos >= 0) & (start >= 0) & (base > 0), last / base - 1, np.nan)
+    return out
+
+def rank_returns(returns, weights=RS_WEIGHTS):
+    """
+    Rangi percentylowe (0-100) dla każdej stopy zwrotu i ocena łączna.
+    returns: DataFrame tickery × stopy (migawka) - ranking po wierszach;
+    zwraca DataFrame z kolumnami <stopa>_pct, rs_score i rs_rank.
+    """
+    pct = returns[list(weights)].rank(pct=True) * 100
+    score = sum(pct[name].fillna(0) * w for name, w in weights.items())
+    total = sum(pct[name].notna() * w for name, w in weights.items())
+    ranks = pct.add_suffix('_pct')
+    ranks['rs_score'] = (score / total.where(total > 0)).round(2)
+    ranks['rs_rank'] = ranks['rs_score'].rank(pct=True).mul(100).round(0)
+    return ranks
+
+def _pct_rank_rows(values):
+    # Ranga percentylowa w każdym wierszu (NaN pomijane); przy remisach
+    # decyduje kolejność kolumn - dla stóp zwrotu remisy są praktycznie nieobecne.
+    import numpy as np
+    valid = ~np.isnan(values)
+    order = np.argsort(np.where(valid, values, np.inf), axis=1, kind='stable')
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(1, values.shape[1] + 1, dtype=float), values.shape), axis=1)
+    count = valid.sum(axis=1, keepdims=True)
+    return np.where(valid, ranks / np.maximum(count, 1) * 100, np.nan)
+
+def rs_history(close, windows=RS_WINDOWS, weights=RS_WEIGHTS):
+    """
+    Rangi RS dla wszystkich dat naraz (daty × tickery), np. do backtestów.
+    Każda data jest rankingowana przekrojowo; zwraca macierz rs_rank.
+    """
+    import numpy as np
+    import pandas as pd
+    values = close.to_numpy(dtype=float)
+    score = np.zeros(values.shape)
+    total = np.zeros(values.shape)
+    for name, window in windows.items():
+        ret = np.full(values.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ret[window:] = values[window:] / values[:-window] - 1
+        pct = _pct_rank_rows(ret)
+        score += np.nan_to_num(pct) * weights[name]
+        total += ~np.isnan(pct) * weights[name]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rank = np.round(_pct_rank_rows(np.where(total > 0, score / total, np.nan)))
+    return pd.DataFrame(rank, index=close.index, columns=close.columns)
+
+def attach_ranks(rows, ranks):
+    """
+    Dopisuje 'rs_rank' (i stopy zwrotu) do słowników sygnałów po kluczu 'ticker'.
+    """
+    lookup = ranks.to_dict('index')
+    for row in rows:
+        r = lookup.get(row['ticker'], {})
+        row['rs_rank'] = r.get('rs_rank', float('nan'))
+        for name in RS_WINDOWS:
+            row[name] = r.get(name, float('nan'))
+    return rows
@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import os
+import pickle
+
+# --- NAGRYWANIE I ODTWARZANIE ODPOWIEDZI (WIKIPEDIA, YAHOO) ---
+# Każde uruchomienie pobiera listy spółek z Wikipedii i ceny z Yahoo na żywo,
+# więc raportu z danej nocy nie da się odtworzyć, a pomiary czasu zależą od
+# sieci. Wszystkie zapytania sieciowe skanerów idą przez http_get / download:
+#   SCAN_REPLAY=record - zapytanie na żywo, odpowiedź zapisana (gzip) w REPLAY_DIR,
+#   SCAN_REPLAY=replay - odpowiedź z nagrania, bez sieci (brak nagrania = błąd),
+#   brak zmiennej       - zwykłe zapytanie na żywo.
+# Nagrania są kluczowane adresem / listą tickerów i parametrami zapytania,
+# więc odtwarzanie wymaga tych samych paczek co nagranie: bez SCAN_MEMORY_MB
+# (rozmiar paczek zależy wtedy od bieżącego RSS) i z PRICE_PROVIDER=yahoo.
+
+from scanner import DATA_DIR
+
+REPLAY_MODE = os.environ.get('SCAN_REPLAY', '').lower()
+REPLAY_DIR = os.environ.get('SCAN_REPLAY_DIR', os.path.join(DATA_DIR, 'replay'))
+# Parametry yf.download bez wpływu na wynik - pomijane w kluczu nagrania
+IGNORED_KWARGS = {'progress', 'threads'}
+
+class RecordedResponse:
+    # Namiastka requests.Response z polami używanymi przez skanery
+    def __init__(self, url, status_code, text):
+        self.url, self.status_code, self.text = url, status_code, text
+        self.content = text.encode('utf-8')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code} (nagranie): {self.url}")
+
+def _path(kind, key):
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20]
+    return os.path.join(REPLAY_DIR, kind, f"{digest}.pkl.gz")
+
+def _save(path, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, 'wb', compresslevel=6) as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def _load(path, what):
+    try:
+        with gzip.open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        raise LookupError(f"Brak nagrania dla {what} w {REPLAY_DIR} (uruchom najpierw z SCAN_REPLAY=record)") from None
+
+def http_get(url, **kwargs):
+    """
+    requests.get z nagrywaniem/odtwarzaniem. Nagłówki nie wchodzą do klucza
+    - ta sama strona z innym User-Agent to to samo nagranie.
+    """
+    path = _path('http', url)
+    if REPLAY_MODE == 'replay':
+        rec = _load(path, url)
+        return RecordedResponse(url, rec['status_code'], rec['text'])
+    import requests
+    response = requests.get(url, **kwargs)
+    if REPLAY_MODE == 'record':
+        _save(path, {'url': url, 'status_code': response.status_code, 'text': response.text})
+    return response
+
+def download(tickers, **kwargs):
+    """
+    yf.download z nagrywaniem/odtwarzaniem. Kluczem jest lista tickerów
+    (w kolejności zapytania) i parametry zapytania.
+    """
+    key = (tuple(tickers) if isinstance(tickers, (list, tuple)) else tickers,
+           tuple(sorted((k, repr(v)) for k, v in kwargs.items() if k not in IGNORED_KWARGS)))
+    path = _path('yahoo', key)
+    if REPLAY_MODE == 'replay':
+        what = f"{len(key[0])} tickerów" if isinstance(key[0], tuple) else key[0]
+        return _load(path, f"yf.download({what}, {dict(key[1])})")
+    import yfinance as yf
+    data = yf.download(tickers, **kwargs)
+    if REPLAY_MODE == 'record' and data is not None:
+        _save(path, data)
+    return data
+
+if __name__ == "__main__":
+    # Podsumowanie nagrań: python replay.py
+    total = 0
+    for kind in ('http', 'yahoo'):
+        folder = os.path.join(REPLAY_DIR, kind)
+        files = os.listdir(folder) if os.path.isdir(folder) else []
+        size = sum(os.path.getsize(os.path.join(folder, f)) for f in files)
+        total += size
+        print(f"{kind:<6} {len(files):5d} nagrań  {size / 2**20:8.1f} MB")
+    print(f"Razem {total / 2**20:.1f} MB w {REPLAY_DIR}")
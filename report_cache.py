@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import time
+
+# --- CACHE RAPORTÓW I WYSYŁEK ---
+# Ręczne uruchomienia (workflow_dispatch) tego samego dnia zwykle dają
+# identyczne sygnały, a i tak budowały cały HTML od zera i wysyłały drugi,
+# identyczny mail. Raport jest tu kluczowany skrótem danych wejściowych
+# (tabele sygnałów, migawka) i wersji szablonu (skrót plików, z których
+# pochodzi jego treść - każda zmiana szablonu to nowy klucz). Ten sam klucz = HTML
+# z dysku, ta sama treść maila do tego samego odbiorcy = brak ponownej
+# wysyłki. Po błędzie SMTP wysyłka nie jest odnotowana, więc ponowne
+# uruchomienie płaci już tylko za doręczenie.
+
+from scanner import DATA_DIR
+
+RENDER_DIR = os.path.join(DATA_DIR, 'render')
+SENT_FILE = os.path.join(RENDER_DIR, 'sent.json')
+RENDER_KEEP_DAYS = 7
+# Wysyłka mimo wpisu w dzienniku (np. test nowego odbiorcy)
+FORCE_SEND = os.environ.get('SCAN_FORCE_SEND') == '1'
+
+_template_versions = {}
+
+def template_version(*paths):
+    """
+    Skrót plików z kodem szablonu raportu.
+    """
+    key = tuple(os.path.abspath(p) for p in paths)
+    if key not in _template_versions:
+        h = hashlib.sha1()
+        for path in key:
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        _template_versions[key] = h.hexdigest()[:12]
+    return _template_versions[key]
+
+def _default(obj):
+    # Serializacja do klucza: tablice i ramki przez skrót zawartości, reszta jako tekst
+    if hasattr(obj, 'to_numpy') and hasattr(obj, 'columns'):
+        import pandas as pd
+        digest = hashlib.sha1(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes()).hexdigest()
+        return [digest, [str(c) for c in obj.columns]]
+    if hasattr(obj, 'dtype') and hasattr(obj, 'tobytes'):
+        if getattr(obj, 'ndim', 0) == 0:
+            return obj.item()
+        return [hashlib.sha1(obj.tobytes()).hexdigest(), str(obj.dtype), list(obj.shape)]
+    if isinstance(obj, (set, frozenset)):
+        return sorted(map(str, obj))
+    return str(obj)
+
+def content_key(*parts):
+    """
+    Skrót (hex) dowolnych danych wejściowych raportu: listy wierszy sygnałów,
+    słowniki, DataFrame, tablice NumPy.
+    """
+    text = json.dumps(parts, sort_keys=True, default=_default, ensure_ascii=False)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:20]
+
+def _prune(now):
+    for name in os.listdir(RENDER_DIR):
+        path = os.path.join(RENDER_DIR, name)
+        if name.endswith('.html') and now - os.path.getmtime(path) > RENDER_KEEP_DAYS * 86400:
+            os.remove(path)
+
+def cached_render(name, key, render):
+    """
+    HTML raportu name dla klucza key: z dysku, a jeśli go nie ma - render() i zapis.
+    """
+    path = os.path.join(RENDER_DIR, f"{name}-{key}.html")
+    try:
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        print(f"Raport {name} bez zmian - HTML z cache.")
+        return html
+    except OSError:
+        pass
+    html = render()
+    try:
+        os.makedirs(RENDER_DIR, exist_ok=True)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(f"{path}.tmp", path)
+        _prune(time.time())
+    except OSError as e:
+        print(f"Nie można zapisać cache raportu: {e}")
+    return html
+
+def _sent_log():
+    try:
+        with open(SENT_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def already_sent(key):
+    """
+    True, jeśli wiadomość o tym kluczu została już wysłana (i nie ustawiono SCAN_FORCE_SEND).
+    """
+    return not FORCE_SEND and key in _sent_log()
+
+def mark_sent(key):
+    """
+    Odnotowuje udaną wysyłkę; wpisy starsze niż RENDER_KEEP_DAYS są usuwane.
+    """
+    now = time.time()
+    log = {k: t for k, t in _sent_log().items() if now - t <= RENDER_KEEP_DAYS * 86400}
+    log[key] = now
+    try:
+        os.makedirs(RENDER_DIR, exist_ok=True)
+        with open(f"{SENT_FILE}.tmp", 'w') as f:
+            json.dump(log, f)
+        os.replace(f"{SENT_FILE}.tmp", SENT_FILE)
+    except OSError as e:
+        print(f"Nie można zapisać dziennika wysyłek: {e}")
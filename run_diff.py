@@ -0,0 +1,122 @@
+import os
+import sys
+
+# --- RÓŻNICE MIĘDZY URUCHOMIENIAMI ---
+# Każdy raport jest samodzielną migawką, więc żeby zobaczyć, co weszło na
+# listy sygnałów lub z nich wypadło od wczoraj, trzeba było porównywać maile.
+# Po każdym skanie stan tickerów (sygnał, wiek, kluczowe wskaźniki) zapisywany
+# jest w zwartym pliku binarnym (tablica strukturalna NumPy, ~20 B na ticker,
+# tickery jako int z rejestru symbols.py), a różnice liczone są operacjami
+# zbiorowymi na posortowanych tablicach identyfikatorów.
+
+from scanner import DATA_DIR
+
+RUNS_DIR = os.path.join(DATA_DIR, 'runs')
+RUNS_KEEP = 60
+# Tylko zmiany w tabelach sygnałów zamiast pełnych list (krótszy raport w spokojne dni)
+REPORT_DIFF_ONLY = os.environ.get('SCAN_REPORT_DIFF') == '1'
+STATE_DTYPE = [('id', '<i4'), ('signal', 'i1'), ('age', 'i1'),
+               ('close', '<f4'), ('rsi', '<f4'), ('adx', '<f4'), ('cross_gap', '<f4')]
+SIGNAL_NAMES = {1: 'Golden', -1: 'Death', 0: '-'}
+
+def run_state(snapshot, bullish, bearish):
+    """
+    Stan uruchomienia: tablica strukturalna STATE_DTYPE posortowana po id,
+    jeden wiersz na ticker z migawki (signal: 1 Golden, -1 Death, 0 brak).
+    """
+    import numpy as np
+    from symbols import symbol_ids
+    state = np.zeros(len(snapshot), dtype=STATE_DTYPE)
+    if snapshot.empty:
+        return state
+    state['id'] = symbol_ids(list(snapshot.index))
+    row = {t: i for i, t in enumerate(snapshot.index)}
+    for rows, sign in ((bullish, 1), (bearish, -1)):
+        for r in rows:
+            i = row.get(r['ticker'])
+            if i is not None:
+                state['signal'][i], state['age'][i] = sign, r['age']
+    for field in ('close', 'rsi', 'adx', 'cross_gap'):
+        if field in snapshot:
+            state[field] = snapshot[field].to_numpy(dtype=float)
+        else:
+            state[field] = np.nan
+    return np.sort(state, order='id')
+
+def save_run(state, run_date, runs_dir=RUNS_DIR):
+    """
+    Zapisuje stan pod datą uruchomienia (ponowny skan tego samego dnia nadpisuje
+    plik) i usuwa pliki starsze niż RUNS_KEEP uruchomień.
+    """
+    import numpy as np
+    from symbols import save_registry
+    # Identyfikatory w pliku mają sens tylko razem z rejestrem
+    save_registry()
+    os.makedirs(runs_dir, exist_ok=True)
+    path = os.path.join(runs_dir, f"{run_date}.npy")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, state, allow_pickle=False)
+    os.replace(tmp, path)
+    for old in sorted(run_dates(runs_dir))[:-RUNS_KEEP]:
+        os.remove(os.path.join(runs_dir, f"{old}.npy"))
+
+def run_dates(runs_dir=RUNS_DIR):
+    if not os.path.isdir(runs_dir):
+        return []
+    return sorted(f[:-4] for f in os.listdir(runs_dir) if f.endswith('.npy'))
+
+def load_run(run_date, runs_dir=RUNS_DIR):
+    import numpy as np
+    return np.load(os.path.join(runs_dir, f"{run_date}.npy"), allow_pickle=False)
+
+def load_previous_run(run_date, runs_dir=RUNS_DIR):
+    """
+    Ostatni zapisany stan sprzed run_date: (data, stan) albo (None, None).
+    """
+    earlier = [d for d in run_dates(runs_dir) if d < run_date]
+    if not earlier:
+        return None, None
+    return earlier[-1], load_run(earlier[-1], runs_dir)
+
+def diff_runs(prev, cur):
+    """
+    Różnice list sygnałów między stanami (posortowanymi po id):
+      entered - sygnał teraz, wcześniej brak (wiersze z cur),
+      exited  - sygnał wcześniej, teraz brak (wiersze z prev; wyszedł z okna
+                lub ticker zniknął z uniwersum),
+      changed - sygnał w obu, ale innego typu albo nowe przecięcie (wiek
+                mniejszy niż poprzednio); wiersze z cur, poprzedni sygnał w 'was'.
+    """
+    import numpy as np
+    p_sig, c_sig = prev[prev['signal'] != 0], cur[cur['signal'] != 0]
+    entered = c_sig[~np.isin(c_sig['id'], p_sig['id'], assume_unique=True)]
+    exited = p_sig[~np.isin(p_sig['id'], c_sig['id'], assume_unique=True)]
+    _, ci, pi = np.intersect1d(c_sig['id'], p_sig['id'], assume_unique=True, return_indices=True)
+    both_c, both_p = c_sig[ci], p_sig[pi]
+    moved = (both_c['signal'] != both_p['signal']) | (both_c['age'] < both_p['age'])
+    return {'entered': entered, 'exited': exited, 'changed': both_c[moved], 'was': both_p[moved]['signal']}
+
+def diff_tickers(diff):
+    """
+    Symbole Yahoo dla każdej grupy różnic: {'entered', 'exited', 'changed'}.
+    """
+    from symbols import symbols_for
+    return {k: list(symbols_for(diff[k]['id'])) for k in ('entered', 'exited', 'changed')}
+
+def format_diff(diff, prev_date):
+    # Wersja tekstowa do konsoli
+    lines = [f"Zmiany względem {prev_date}:"]
+    names = diff_tickers(diff)
+    for key, label in (('entered', 'Nowe'), ('exited', 'Wypadły'), ('changed', 'Zmiana')):
+        items = [f"{t} ({SIGNAL_NAMES[int(s)]})" for t, s in zip(names[key], diff[key]['signal'])]
+        lines.append(f"  {label:<8} {len(items):4d}  {', '.join(items)}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    # Różnica dwóch ostatnich (lub podanych) uruchomień: python run_diff.py [poprzednia data] [data]
+    dates = sys.argv[1:3] if len(sys.argv) > 2 else run_dates()[-2:]
+    if len(dates) < 2:
+        print(f"Za mało zapisanych uruchomień w {RUNS_DIR}.")
+        sys.exit(1)
+    print(format_diff(diff_runs(load_run(dates[0]), load_run(dates[1])), dates[0]))
@@ -0,0 +1,255 @@
+import gc
+import os
+import resource
+import time
+
+# --- SILNIK SKANOWANIA (MACIERZE DATY × TICKERY) ---
+# Wskaźniki liczone są dla całej paczki tickerów naraz, a z etapu sygnałów
+# wychodzą tylko małe wiersze wyników. Dzięki temu uniwersum można
+# przetwarzać w paczkach o ograniczonym rozmiarze (tryb z limitem pamięci).
+
+# Limit pamięci procesu w MB; brak = całe uniwersum w jednej paczce
+SCAN_MEMORY_MB = os.environ.get('SCAN_MEMORY_MB')
+# Katalog na dane trwałe między uruchomieniami (historia, cache)
+DATA_DIR = os.environ.get('SCAN_DATA_DIR', 'data')
+
+# Szacunkowa liczba komórek float64 na (ticker × sesję): 5 pól OHLCV z kopiami
+# robionymi przez yfinance/pandas przy składaniu ramki + macierze wskaźników.
+CELLS_PER_TICKER_SESSION = 64
+MIN_CHUNK = 20
+SESSIONS_PER_PERIOD = {'6mo': 126, '7mo': 148, '1y': 252, '2y': 504, '5y': 1260}
+# Wskaźniki zapisywane w historii wiersza sygnału (find_signals(history=N))
+HISTORY_FIELDS = {'close': 'Close', 'ma20': 'MA20', 'ma50': 'MA50', 'rsi': 'RSI', 'adx': 'ADX'}
+
+def current_rss_mb():
+    """
+    Bieżące zużycie pamięci procesu (RSS) w MB. Na Linuksie z /proc,
+    gdzie indziej szczytowe zużycie z getrusage.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def chunk_size_for_memory(memory_mb, n_sessions, n_tickers):
+    """
+    Ile tickerów zmieści się w jednej paczce przy danym limicie pamięci.
+    Połowa wolnego budżetu zostaje jako zapas na pracę pandas.
+    """
+    if not memory_mb:
+        return max(n_tickers, 1)
+    free_bytes = max(float(memory_mb) - current_rss_mb(), 0) * 2**20 * 0.5
+    per_ticker = n_sessions * CELLS_PER_TICKER_SESSION * 8
+    return max(MIN_CHUNK, min(n_tickers, int(free_bytes // per_ticker)))
+
+def scan_in_chunks(tickers, process_chunk, memory_mb=SCAN_MEMORY_MB, period='6mo', pause=0, max_chunk=None,
+                   n_extra=0):
+    """
+    Przepuszcza tickery paczkami przez process_chunk(paczka) -> (bycze, niedźwiedzie)
+    i zbiera tylko wiersze wyników. Jeśli process_chunk zwraca dodatkowe listy
+    (n_extra, np. migawki stanu tickerów), są one sklejane tak samo i dopisywane
+    na końcu wyniku. Po każdej paczce dane cenowe są zwalniane;
+    jeśli mimo to proces zbliża się do limitu, kolejne paczki są o połowę mniejsze.
+    max_chunk ogranicza paczkę niezależnie od pamięci (np. limit zapytań do API).
+    """
+    from profiling import section
+    n_sessions = SESSIONS_PER_PERIOD.get(period, 252)
+    chunk = chunk_size_for_memory(memory_mb, n_sessions, len(tickers))
+    if max_chunk:
+        chunk = min(chunk, max_chunk)
+    bullish, bearish = [], []
+    extras = [[] for _ in range(n_extra)]
+    i = 0
+    while i < len(tickers):
+        batch = tickers[i:i + chunk]
+        if memory_mb:
+            print(f"Paczka {i}-{i + len(batch)} z {len(tickers)} (RSS {current_rss_mb():.0f} MB / limit {memory_mb} MB)")
+        elif max_chunk:
+            print(f"Przetwarzanie {i} do {i + len(batch)}...")
+        with section('scan_in_chunks', f"{i}-{i + len(batch)}"):
+            chunk_results = process_chunk(batch)
+        bullish.extend(chunk_results[0])
+        bearish.extend(chunk_results[1])
+        for extra, part in zip(extras, chunk_results[2:]):
+            extra.extend(part)
+        i += len(batch)
+
+        gc.collect()
+        if memory_mb and current_rss_mb() > 0.8 * float(memory_mb) and chunk > MIN_CHUNK:
+            chunk = max(MIN_CHUNK, chunk // 2)
+            print(f"Zbliżamy się do limitu pamięci - paczki zmniejszone do {chunk} tickerów.")
+        if pause and i < len(tickers):
+            time.sleep(pause)
+    return (bullish, bearish, *extras)
+
+def compute_indicators(px):
+    """
+    Liczy MA20/MA50, średni wolumen, RSI i ADX dla macierzy cen z price_fields.
+    Zwraca słownik macierzy daty × tickery.
+    """
+    from indicators import adx, rsi
+    close, volume = px['Close'], px['Volume']
+    return {
+        'Close': close,
+        'Volume': volume,
+        'MA20': close.rolling(window=20).mean(),
+        'MA50': close.rolling(window=50).mean(),
+        'VolMA20': volume.rolling(window=20).mean(),
+        'RSI': rsi(close, 14),
+        'ADX': adx(px['High'], px['Low'], close, 14),
+    }
+
+def find_signals(ind, metadata, lookback_window=5, tickers=None, history=0, min_history=60):
+    """
+    Szuka przecięć MA20/MA50 z ostatnich lookback_window sesji.
+    Ticker bierze udział, jeśli ma co najmniej min_history świec (dla
+    świec dziennych 60; wyższe interwały podają własne minimum z TIMEFRAMES).
+    Zwraca (bycze, niedźwiedzie) jako listy słowników wyników.
+    history > 0 dodaje do wiersza 'history': {pole: float32[history]} -
+    ostatnie sesje wskaźników z HISTORY_FIELDS (np. do wykresów w raporcie).
+
+    Macierze muszą być wyrównane do wspólnej osi sesji
+    (trading_calendar.align_sessions): wiersz -1 to ostatnia sesja dla
+    wszystkich tickerów, więc przecięcia wykrywane są naraz dla całej paczki.
+    Tickery bez notowania na ostatniej sesji są pomijane.
+    """
+    import numpy as np
+    close = ind['Close']
+    c = close.to_numpy(dtype=float)
+    m20, m50 = ind['MA20'].to_numpy(dtype=float), ind['MA50'].to_numpy(dtype=float)
+    n = len(c)
+
+    eligible = (~np.isnan(c)).sum(axis=0) >= min_history
+    if n:
+        eligible &= ~np.isnan(c[-1])
+    age = np.full(c.shape[1], -1)
+    kind = np.zeros(c.shape[1], dtype=int)   # 1 = bycze, -1 = niedźwiedzie
+    for i in range(1, min(lookback_window, n - 1) + 1):
+        t, y = n - i, n - i - 1
+        golden = (m20[y] <= m50[y]) & (m20[t] > m50[t])
+        death = (m20[y] >= m50[y]) & (m20[t] < m50[t])
+        new = eligible & (age < 0) & (golden | death)
+        age[new] = i - 1
+        kind[new & golden] = 1
+        kind[new & death] = -1
+
+    col_of = {t: j for j, t in enumerate(close.columns)}
+    vol, vol_avg = ind['Volume'].to_numpy(dtype=float), ind['VolMA20'].to_numpy(dtype=float)
+    rsi, adx = ind['RSI'].to_numpy(dtype=float), ind['ADX'].to_numpy(dtype=float)
+    # Historia wycinana raz dla wszystkich trafień paczki
+    hist = {}
+    if history and n:
+        hit_cols = np.flatnonzero(age >= 0)
+        hist = {key: ind[name].to_numpy()[-history:, hit_cols].astype(np.float32) for key, name in HISTORY_FIELDS.items()}
+        hist_of = {j: k for k, j in enumerate(hit_cols)}
+    bullish, bearish = [], []
+    for ticker in (close.columns if tickers is None else tickers):
+        j = col_of.get(ticker)
+        if j is None or age[j] < 0 or ticker not in metadata: continue
+        info = {
+            'ticker': ticker, 'name': metadata[ticker].get('Name', 'N/A'),
+            'sector': metadata[ticker].get('Sector', 'N/A'), 'close': c[-1, j],
+            'ma20': m20[-1, j], 'ma50': m50[-1, j],
+            'dist_ma20': ((c[-1, j] - m20[-1, j]) / m20[-1, j]) * 100,
+            'rsi': rsi[-1, j], 'adx': adx[-1, j] if adx[-1, j] == adx[-1, j] else 0,
+            'vol_ratio': vol[-1, j] / vol_avg[-1, j] if vol_avg[-1, j] > 0 else 0,
+            'age': int(age[j])
+        }
+        if hist:
+            info['history'] = {key: m[:, hist_of[j]].copy() for key, m in hist.items()}
+        bullish.append(info) if kind[j] == 1 else bearish.append(info)
+    return bullish, bearish
+
+def near_cross(ind, slope_window=5):
+    """
+    Prognoza przecięcia MA20/MA50 dla wszystkich tickerów naraz (wzory
+    zamknięte, bez dodatkowego przejścia po danych). Jutro MA20 i MA50
+    zmienią się o (P - cena wypadająca z okna) / okno, więc cena P, przy
+    której średnie się zrównają, to:
+        P* = (20 * (S50 - C[-50]) - 50 * (S20 - C[-20])) / 30,
+    gdzie S20/S50 to dzisiejsze sumy okien. Golden Cross wymaga P > P*,
+    Death Cross P < P*. Liczba sesji do przecięcia zakłada, że różnica
+    MA20 - MA50 zmienia się dalej w tempie z ostatnich slope_window sesji
+    (NaN, gdy średnie się rozchodzą). P* <= 0 oznacza, że żadna dodatnia
+    cena jutro nie da przecięcia - trigger_price/trigger_pct są wtedy NaN.
+    Zwraca DataFrame: cross_gap (%), trigger_price, trigger_pct (% od
+    ostatniego zamknięcia), sessions_to_cross.
+    """
+    import numpy as np
+    import pandas as pd
+    close = ind['Close']
+    c = close.to_numpy(dtype=float)
+    m20, m50 = ind['MA20'].to_numpy(dtype=float), ind['MA50'].to_numpy(dtype=float)
+    nan = np.full(c.shape[1], np.nan)
+    if len(c) < max(50, slope_window + 1):
+        return pd.DataFrame({'cross_gap': nan, 'trigger_price': nan, 'trigger_pct': nan,
+                             'sessions_to_cross': nan}, index=close.columns)
+    last, gap = c[-1], m20[-1] - m50[-1]
+    trigger = (20 * (50 * m50[-1] - c[-50]) - 50 * (20 * m20[-1] - c[-20])) / 30
+    trigger = np.where(trigger > 0, trigger, np.nan)
+    rate = (gap - (m20[-1 - slope_window] - m50[-1 - slope_window])) / slope_window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sessions = np.where(gap * rate < 0, -gap / rate, np.nan)
+        return pd.DataFrame({
+            'cross_gap': gap / m50[-1] * 100,
+            'trigger_price': trigger,
+            'trigger_pct': (trigger / last - 1) * 100,
+            'sessions_to_cross': sessions,
+        }, index=close.columns)
+
+def last_valid_positions(close):
+    """
+    Indeks ostatniej sesji z ceną dla każdej kolumny macierzy (-1 gdy brak danych).
+    """
+    import numpy as np
+    valid = close.notna().to_numpy()
+    pos = len(valid) - 1 - valid[::-1].argmax(axis=0)
+    return np.where(valid.any(axis=0), pos, -1)
+
+def ticker_snapshot(ind, metadata, cross_window=5):
+    """
+    Stan każdego tickera na jego ostatniej sesji (cena, MA, RSI, ADX, stopy
+    zwrotu 1/3/6M) oraz liczba przecięć MA20/MA50 w ostatnich cross_window sesjach - wszystko
+    liczone wektorowo dla całej paczki. Zwraca DataFrame indeksowany tickerem.
+    """
+    import numpy as np
+    import pandas as pd
+    from ranking import trailing_returns
+    close = ind['Close']
+    pos = last_valid_positions(close)
+    cols = np.arange(close.shape[1])
+    ok = pos >= 0
+
+    def last(name):
+        return ind[name].to_numpy(dtype=float)[pos[ok], cols[ok]]
+
+    diff = (ind['MA20'] - ind['MA50']).to_numpy(dtype=float)
+    today, prev = diff[-cross_window:], diff[-cross_window - 1:-1]
+    golden = ((prev <= 0) & (today > 0)).sum(axis=0)
+    death = ((prev >= 0) & (today < 0)).sum(axis=0)
+
+    tickers = close.columns[ok]
+    snap = pd.DataFrame({
+        'sector': [metadata.get(t, {}).get('Sector', 'N/A') for t in tickers],
+        'date': close.index[pos[ok]],
+        'close': last('Close'), 'ma20': last('MA20'), 'ma50': last('MA50'),
+        'rsi': last('RSI'), 'adx': last('ADX'),
+        'golden': golden[ok], 'death': death[ok],
+        **{name: ret[ok] for name, ret in trailing_returns(close, pos).items()},
+    }, index=tickers)
+    return snap[snap.index.isin(list(metadata))]
+
+def sector_aggregates(snapshot):
+    """
+    Agregaty sektorowe z migawki tickerów (redukcje grupowe):
+    liczba spółek, % powyżej MA50, mediana RSI, średni ADX, liczba
+    Golden/Death Cross w oknie migawki.
+    """
+    snap = snapshot.assign(above_ma50=(snapshot['close'] > snapshot['ma50']).astype(float)
+                           .where(snapshot['ma50'].notna()))
+    grouped = snap.groupby('sector')
+    return grouped.agg(members=('close', 'size'), pct_above_ma50=('above_ma50', 'mean'),
+                       median_rsi=('rsi', 'median'), avg_adx=('adx', 'mean'),
+                       golden=('golden', 'sum'), death=('death', 'sum')).assign(
+                           pct_above_ma50=lambda df: df['pct_above_ma50'] * 100)
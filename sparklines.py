@@ -0,0 +1,97 @@
+import hashlib
+import os
+import struct
+import zlib
+
+# --- MINIWYKRESY (SPARKLINES) DLA WIERSZY SYGNAŁÓW ---
+# Każdy wiersz sygnału niesie krótką historię wskaźników (find_signals(history=N)).
+# Tu zamieniamy ją na małe obrazki PNG: cena + MA20 + MA50 z ostatnich sesji.
+# Gmail nie wyświetla SVG ani obrazków data:, więc PNG trafiają do maila jako
+# załączniki inline (cid:). Wszystkie wykresy rysowane są naraz w NumPy
+# (bez matplotlib), a gotowe PNG trafiają do cache kluczowanego treścią -
+# ten sam wykres przy kolejnym raporcie nie jest rysowany ponownie.
+
+from scanner import DATA_DIR
+
+SPARK_CACHE_DIR = os.path.join(DATA_DIR, 'sparklines')
+SPARK_SESSIONS = 30
+SPARK_WIDTH, SPARK_HEIGHT = 90, 24
+# Kolejność rysowania: późniejsze linie na wierzchu
+SPARK_LINES = ('ma50', 'ma20', 'close')
+# Paleta: tło, MA50 (pomarańczowa), MA20 (niebieska), cena (ciemna)
+PALETTE = bytes([255, 255, 255, 230, 126, 34, 52, 152, 219, 44, 62, 80])
+
+def _png(pixels):
+    # Minimalny koder PNG z paletą (typ koloru 3) dla macierzy indeksów uint8
+    height, width = pixels.shape
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+    raw = b''.join(b'\x00' + pixels[y].tobytes() for y in range(height))
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)) \
+        + chunk(b'PLTE', PALETTE) + chunk(b'IDAT', zlib.compress(raw, 9)) + chunk(b'IEND', b'')
+
+def rasterize(lines, width=SPARK_WIDTH, height=SPARK_HEIGHT):
+    """
+    Rysuje linie dla wielu wykresów naraz. lines: float (linie × wykresy × sesje),
+    wspólna skala pionowa w obrębie wykresu. Zwraca uint8 (wykresy × wys × szer)
+    z indeksami palety (0 = tło, k = linia k-1).
+    """
+    import numpy as np
+    k, rows, n = lines.shape
+    img = np.zeros((rows, height, width), dtype=np.uint8)
+    if rows == 0 or n == 0:
+        return img
+    with np.errstate(invalid='ignore'):
+        lo, hi = np.nanmin(lines, axis=(0, 2)), np.nanmax(lines, axis=(0, 2))
+    span = np.where(hi > lo, hi - lo, 1.0)[:, None]
+    # Interpolacja liniowa sesji na kolumny pikseli
+    xs = np.linspace(0, n - 1, width)
+    i0 = np.floor(xs).astype(int)
+    i1 = np.minimum(i0 + 1, n - 1)
+    f = xs - i0
+    yy = np.arange(height)[None, :, None]
+    for li in range(k):
+        v = lines[li]
+        y = (hi[:, None] - (v[:, i0] * (1 - f) + v[:, i1] * f)) / span * (height - 1)
+        # Łączymy kolejne punkty pionowym odcinkiem; NaN po jednej stronie = sam punkt
+        prev = np.concatenate([y[:, :1], y[:, :-1]], axis=1)
+        top, bottom = np.round(np.fmin(y, prev)), np.round(np.fmax(y, prev))
+        with np.errstate(invalid='ignore'):
+            on = (yy >= top[:, None, :]) & (yy <= bottom[:, None, :])
+        img[on] = li + 1
+    return img
+
+def _key(lines):
+    return hashlib.sha1(lines.tobytes() + struct.pack('>II', SPARK_WIDTH, SPARK_HEIGHT)).hexdigest()[:16]
+
+def attach_sparklines(rows, sessions=SPARK_SESSIONS):
+    """
+    Dodaje do wierszy z 'history' klucz 'spark' (Content-ID obrazka) i zwraca
+    {cid: PNG}. Brakujące w cache wykresy rysowane są jedną partią.
+    """
+    import numpy as np
+    rows = [r for r in rows if 'history' in r]
+    if not rows:
+        return {}
+    lines = np.stack([np.stack([r['history'][name][-sessions:] for name in SPARK_LINES]) for r in rows], axis=1)
+    keys = [_key(np.ascontiguousarray(lines[:, i])) for i in range(len(rows))]
+
+    images, missing, seen = {}, [], set()
+    for i, key in enumerate(keys):
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            with open(os.path.join(SPARK_CACHE_DIR, f"{key}.png"), 'rb') as f:
+                images[key] = f.read()
+        except OSError:
+            missing.append(i)
+    if missing:
+        os.makedirs(SPARK_CACHE_DIR, exist_ok=True)
+        for i, pixels in zip(missing, rasterize(lines[:, missing])):
+            images[keys[i]] = _png(pixels)
+            with open(os.path.join(SPARK_CACHE_DIR, f"{keys[i]}.png"), 'wb') as f:
+                f.write(images[keys[i]])
+    for r, key in zip(rows, keys):
+        r['spark'] = f"spark-{key}"
+    return {f"spark-{key}": png for key, png in images.items()}
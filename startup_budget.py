@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import time
+
+# --- BUDŻET STARTU ---
+# Import skryptu (bez uruchamiania main) nie może trwać dłużej niż budżet.
+# Ciężkie biblioteki mają się ładować dopiero w etapie, który ich używa.
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 150))
+ENTRY_POINTS = ['SP500_SP600_scan', 'main', 'main2', 'main3', 'main4', 'watchlist']
+HEAVY_MODULES = ['yfinance', 'pandas', 'numpy', 'requests', 'smtplib']
+REPEATS = 3
+
+def measure_import(module, repeats=REPEATS):
+    """
+    Mierzy czas (ms) importu modułu w świeżym interpreterze, pomniejszony
+    o koszt samego startu Pythona. Zwraca najlepszy wynik z kilku prób.
+    """
+    check = f"import sys; import {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    best, best_base, loaded = None, None, ''
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        base = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', check], check=True, capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed = time.perf_counter() - t0
+        loaded = out.stdout.strip()
+
+        best = elapsed if best is None else min(best, elapsed)
+        best_base = base if best_base is None else min(best_base, base)
+    return max(0.0, (best - best_base) * 1000), loaded
+
+def main():
+    failed = []
+    print(f"Budżet startu: {STARTUP_BUDGET_MS:.0f} ms na skrypt")
+    for module in ENTRY_POINTS:
+        ms, loaded = measure_import(module)
+        status = "OK" if ms <= STARTUP_BUDGET_MS and not loaded else "PRZEKROCZONY"
+        extra = f" (załadowano: {loaded})" if loaded else ""
+        print(f"  {module:<18} {ms:7.1f} ms  {status}{extra}")
+        if status != "OK":
+            failed.append(module)
+
+    if failed:
+        print(f"Przekroczony budżet startu: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
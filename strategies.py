@@ -0,0 +1,236 @@
+import ast
+import os
+import sys
+
+# --- STRATEGIE Z PLIKU (strategies.toml) ---
+# Progi strategii (MIN_ADX, MAX_RSI_LONG, MIN_PRICE...) żyły jako stałe
+# w osobnych skryptach main2/main3/main4, a logika filtrów w łańcuchach if.
+# Tu każdy wariant to kilka warunków w pliku TOML, np.
+#
+#   [swing]
+#   description = "MA20/50 Cross + ADX > 20"
+#   filters = ["ADX > 20", "ADX > ADX[-1] or ADX > 30"]
+#   bullish = ["cross_up(MA20, MA50)", "RSI <= 70"]
+#   bearish = ["cross_down(MA20, MA50)", "RSI >= 30"]
+#
+# Warunki są kompilowane raz do funkcji na wektorach NumPy (jeden wiersz
+# macierzy wskaźników = wszystkie tickery paczki), a wiersze wskaźników są
+# współdzielone przez wszystkie strategie - dziesiątki wariantów kosztują
+# tyle, co jedno przejście po macierzach. Skrypty main2/main3/main4 liczą
+# swoje warianty (swing_strict, swing, small_cap_liquid) przez strategy_signals.
+#
+# Składnia warunków: nazwy z SERIES, NAZWA[-k] = wartość sprzed k sesji,
+# liczby, + - * /, porównania (także łańcuchowe: 30 <= RSI <= 70),
+# and / or / not oraz cross_up(A, B[, sesje]) / cross_down(A, B[, sesje]).
+
+STRATEGIES_FILE = os.environ.get('SCAN_STRATEGIES', 'strategies.toml')
+# Macierze z scanner.compute_indicators + RVOL = Volume / VolMA20
+SERIES = ('Close', 'Volume', 'MA20', 'MA50', 'VolMA20', 'RSI', 'ADX', 'RVOL')
+MIN_HISTORY = 60           # jak w find_signals: krótsza historia = brak sygnału
+SIDES = ('bullish', 'bearish')
+
+def load_strategies(path=STRATEGIES_FILE):
+    """
+    Wczytuje plik strategii. Zwraca {nazwa: spec} (pusty, gdy pliku nie ma).
+    """
+    import tomllib
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+def _offset(node, expr):
+    # NAZWA[-k] -> k (liczba sesji wstecz)
+    k = node.slice
+    if isinstance(k, ast.UnaryOp) and isinstance(k.op, ast.USub) and isinstance(k.operand, ast.Constant) \
+            and isinstance(k.operand.value, int) and k.operand.value >= 0:
+        return k.operand.value
+    if isinstance(k, ast.Constant) and k.value == 0:
+        return 0
+    raise ValueError(f"'{expr}': przesunięcie musi mieć postać NAZWA[-k]")
+
+def _series(node, expr):
+    # Nazwa serii lub NAZWA[-k] -> (nazwa, k)
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        name, k = node.value.id, _offset(node, expr)
+    elif isinstance(node, ast.Name):
+        name, k = node.id, 0
+    else:
+        raise ValueError(f"'{expr}': oczekiwano nazwy wskaźnika")
+    if name not in SERIES:
+        raise ValueError(f"'{expr}': nieznany wskaźnik {name} (dostępne: {', '.join(SERIES)})")
+    return name, k
+
+def _compile_node(node, expr):
+    import operator
+    from functools import reduce
+
+    import numpy as np
+    compare_ops = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt,
+                   ast.GtE: operator.ge, ast.Eq: operator.eq}
+    binary_ops = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = float(node.value)
+        return lambda row: value
+    if isinstance(node, (ast.Name, ast.Subscript)):
+        name, k = _series(node, expr)
+        return lambda row: row(name, k)
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand, expr)
+        if isinstance(node.op, ast.USub):
+            return lambda row: -operand(row)
+        if isinstance(node.op, ast.Not):
+            return lambda row: ~np.asarray(operand(row), dtype=bool)
+    if isinstance(node, ast.BinOp) and type(node.op) in binary_ops:
+        op, left, right = binary_ops[type(node.op)], _compile_node(node.left, expr), _compile_node(node.right, expr)
+        return lambda row: op(left(row), right(row))
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(v, expr) for v in node.values]
+        op = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return lambda row: reduce(op, (p(row) for p in parts))
+    if isinstance(node, ast.Compare) and all(type(o) in compare_ops for o in node.ops):
+        terms = [_compile_node(n, expr) for n in [node.left] + node.comparators]
+        ops = [compare_ops[type(o)] for o in node.ops]
+        def compare(row):
+            values = [t(row) for t in terms]
+            return reduce(np.logical_and, (op(a, b) for op, a, b in zip(ops, values, values[1:])))
+        return compare
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ('cross_up', 'cross_down') \
+            and len(node.args) in (2, 3) and not node.keywords:
+        (a, ka), (b, kb) = _series(node.args[0], expr), _series(node.args[1], expr)
+        within = 1
+        if len(node.args) == 3:
+            if not (isinstance(node.args[2], ast.Constant) and isinstance(node.args[2].value, int) and node.args[2].value >= 1):
+                raise ValueError(f"'{expr}': liczba sesji w {node.func.id} musi być dodatnią liczbą całkowitą")
+            within = node.args[2].value
+        up = node.func.id == 'cross_up'
+        def cross(row):
+            # Przecięcie w dowolnej z ostatnich `within` sesji
+            hit = False
+            for i in range(within):
+                ta, tb, ya, yb = row(a, ka + i), row(b, kb + i), row(a, ka + i + 1), row(b, kb + i + 1)
+                hit = hit | (((ya <= yb) & (ta > tb)) if up else ((ya >= yb) & (ta < tb)))
+            return hit
+        return cross
+    raise ValueError(f"'{expr}': niedozwolona konstrukcja {type(node).__name__}")
+
+def compile_condition(expr):
+    """
+    Kompiluje jeden warunek do funkcji f(row) -> wektor bool po tickerach,
+    gdzie row(nazwa, k) zwraca wiersz macierzy wskaźnika sprzed k sesji.
+    """
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"'{expr}': błąd składni ({e.msg})") from None
+    return _compile_node(tree.body, expr)
+
+def compile_strategies(specs):
+    """
+    Kompiluje wszystkie strategie z load_strategies. Warunki 'filters' są
+    wspólne dla obu stron. Błąd w strategii zgłaszany jest z jej nazwą.
+    Zwraca {nazwa: {'description', 'bullish': [f...], 'bearish': [f...]}}.
+    """
+    compiled = {}
+    for name, spec in specs.items():
+        try:
+            filters = [compile_condition(c) for c in spec.get('filters', [])]
+            compiled[name] = {'description': spec.get('description', '')}
+            for side in SIDES:
+                conditions = spec.get(side, [])
+                compiled[name][side] = filters + [compile_condition(c) for c in conditions] if conditions else None
+        except (ValueError, AttributeError, TypeError) as e:
+            raise ValueError(f"Strategia {name}: {e}") from None
+    return compiled
+
+def evaluate_strategies(ind, compiled, tickers=None):
+    """
+    Ocenia wszystkie strategie na ostatniej sesji macierzy wskaźników
+    (wyrównanych do wspólnej osi sesji). Zwraca DataFrame bool
+    tickery × (strategia, strona).
+    """
+    import numpy as np
+    import pandas as pd
+    close = ind['Close']
+    n = len(close)
+    c = close.to_numpy(dtype=float)
+    eligible = ((~np.isnan(c)).sum(axis=0) >= MIN_HISTORY) & (~np.isnan(c[-1]) if n else False)
+
+    # Wiersze wskaźników liczone raz i współdzielone przez wszystkie strategie
+    rows = {}
+    def row(name, k):
+        if (name, k) not in rows:
+            if k >= n:
+                rows[name, k] = np.full(close.shape[1], np.nan)
+            elif name == 'RVOL':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    rows[name, k] = row('Volume', k) / row('VolMA20', k)
+            else:
+                rows[name, k] = ind[name].to_numpy(dtype=float)[n - 1 - k]
+        return rows[name, k]
+
+    result = {}
+    for name, strategy in compiled.items():
+        for side in SIDES:
+            conditions = strategy[side]
+            mask = eligible.copy() if conditions else np.zeros(close.shape[1], dtype=bool)
+            for cond in conditions or []:
+                mask &= np.asarray(cond(row), dtype=bool)
+            result[name, side] = mask
+    columns = pd.MultiIndex.from_tuples(list(result), names=['strategy', 'side']) if result else None
+    hits = pd.DataFrame(np.column_stack(list(result.values())) if result else None,
+                        index=close.columns, columns=columns, dtype=bool)
+    if tickers is not None:
+        hits = hits.reindex([t for t in tickers if t in hits.index])
+    return hits
+
+def load_strategy(name, path=STRATEGIES_FILE):
+    """
+    Specyfikacja jednej strategii z pliku (ValueError, gdy jej nie ma).
+    """
+    specs = load_strategies(path)
+    if name not in specs:
+        raise ValueError(f"Brak strategii {name} w {path}")
+    return specs[name]
+
+def strategy_signals(px, name, tickers=None, path=STRATEGIES_FILE):
+    """
+    Jedna strategia z pliku dla macierzy cen (price_fields): wyrównanie do
+    osi sesji, wskaźniki, ocena na ostatniej sesji. Zwraca (bycze, niedźwiedzie)
+    jako wiersze {'ticker', 'close', 'ma20', 'ma50', 'rsi', 'adx', 'vol_ratio'}
+    - dla skryptów main2/main3/main4, których progi są tylko w pliku strategii.
+    """
+    import numpy as np
+    from scanner import compute_indicators
+    from trading_calendar import align_sessions
+    compiled = compile_strategies({name: load_strategy(name, path)})
+    px, _ = align_sessions(px)
+    ind = compute_indicators(px)
+    hits = evaluate_strategies(ind, compiled, tickers=tickers)
+    last = {k: ind[col].iloc[-1] for k, col in (('close', 'Close'), ('ma20', 'MA20'), ('ma50', 'MA50'),
+                                                ('rsi', 'RSI'), ('adx', 'ADX'))}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rvol = (ind['Volume'].iloc[-1] / ind['VolMA20'].iloc[-1]).where(ind['VolMA20'].iloc[-1] > 0, 0.0)
+    def rows(side):
+        return [{'ticker': t, **{k: float(v[t]) for k, v in last.items()}, 'vol_ratio': float(rvol[t])}
+                for t in strategy_tickers(hits, name, side)]
+    return rows('bullish'), rows('bearish')
+
+def strategy_tickers(hits, name, side):
+    """
+    Lista tickerów spełniających strategię po danej stronie.
+    """
+    return list(hits.index[hits[(name, side)]]) if (name, side) in hits.columns else []
+
+if __name__ == "__main__":
+    # Sprawdzenie pliku: python strategies.py [plik.toml]
+    path = sys.argv[1] if len(sys.argv) > 1 else STRATEGIES_FILE
+    try:
+        compiled = compile_strategies(load_strategies(path))
+    except ValueError as e:
+        print(f"Błąd w pliku strategii {path}: {e}")
+        sys.exit(1)
+    print(f"{path}: {len(compiled)} strategii")
+    for name, strategy in compiled.items():
+        print(f"  {name:<20} {strategy['description']}")
@@ -0,0 +1,111 @@
+import csv
+import os
+import re
+import sys
+import threading
+
+# --- REJESTR SYMBOLI ---
+# Ten sam walor występuje w różnych formach: Wikipedia "BRK.B", Yahoo "BRK-B",
+# giełda "BRK/B" lub "BRK B". Wszystkie formy sprowadzamy tu raz do postaci
+# Yahoo i do stałego, zwartego identyfikatora int zapisywanego między
+# uruchomieniami (SYMBOLS_FILE). Struktury, które łączą dane z różnych źródeł
+# (np. przedziały składu indeksów vs kolumny macierzy cen), porównują
+# tablice int zamiast słowników kluczowanych napisami.
+
+from scanner import DATA_DIR
+
+SYMBOLS_FILE = os.path.join(DATA_DIR, 'symbols.csv')
+UNKNOWN_ID = -1
+_SEPARATORS = re.compile(r'[./\s]+')
+
+# Rejestr procesu: {'symbols': [symbol Yahoo wg id], 'ids': {forma: id}, 'dirty': bool}
+_registry = None
+# Listy spółek pobierane są w wątkach (wiki_tables.fetch_all) - nadawanie id pod blokadą
+_lock = threading.RLock()
+
+def normalize_symbol(symbol):
+    """
+    Forma Yahoo symbolu z dowolnego źródła: BRK.B / BRK/B / "BRK B" -> BRK-B.
+    """
+    return _SEPARATORS.sub('-', str(symbol).strip().upper())
+
+def normalize_symbols(symbols):
+    return [normalize_symbol(s) for s in symbols]
+
+def load_registry(path=SYMBOLS_FILE):
+    """
+    Wczytuje rejestr z pliku (id, symbol, alias). Brak pliku = pusty rejestr.
+    """
+    registry = {'symbols': [], 'ids': {}, 'dirty': False}
+    if os.path.exists(path):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                sid = int(row['id'])
+                if sid == len(registry['symbols']):
+                    registry['symbols'].append(row['symbol'])
+                registry['ids'][row['alias']] = sid
+    return registry
+
+def get_registry():
+    global _registry
+    with _lock:
+        if _registry is None:
+            _registry = load_registry()
+    return _registry
+
+def save_registry(path=SYMBOLS_FILE):
+    """
+    Zapisuje rejestr, jeśli w tym uruchomieniu doszły nowe symbole lub formy.
+    """
+    registry = get_registry()
+    if not registry['dirty']:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    rows = sorted(registry['ids'].items(), key=lambda kv: (kv[1], kv[0] != registry['symbols'][kv[1]], kv[0]))
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'symbol', 'alias'])
+        writer.writerows((sid, registry['symbols'][sid], alias) for alias, sid in rows)
+    os.replace(tmp, path)
+    registry['dirty'] = False
+
+def symbol_ids(symbols, add=True):
+    """
+    Identyfikatory int dla symboli w dowolnej formie (tablica NumPy int32).
+    add=True dopisuje nowe symbole do rejestru, add=False zwraca dla nich UNKNOWN_ID.
+    """
+    import numpy as np
+    registry = get_registry()
+    ids = registry['ids']
+    out = np.empty(len(symbols), dtype=np.int32)
+    with _lock:
+        for i, raw in enumerate(symbols):
+            sid = ids.get(raw)
+            if sid is None:
+                canonical = normalize_symbol(raw)
+                sid = ids.get(canonical)
+                if sid is None and add:
+                    sid = len(registry['symbols'])
+                    registry['symbols'].append(canonical)
+                    ids[canonical] = sid
+                    registry['dirty'] = True
+                if sid is not None and add and raw != canonical:
+                    ids[raw] = sid
+                    registry['dirty'] = True
+            out[i] = UNKNOWN_ID if sid is None else sid
+    return out
+
+def symbols_for(ids):
+    """
+    Symbole Yahoo dla identyfikatorów (odwrotność symbol_ids).
+    """
+    import numpy as np
+    return np.asarray(get_registry()['symbols'], dtype=object)[np.asarray(ids)]
+
+if __name__ == "__main__":
+    # Podgląd: python symbols.py BRK.B "BF B" AAPL
+    ids = symbol_ids(sys.argv[1:], add=False)
+    for raw, sid in zip(sys.argv[1:], ids):
+        print(f"  {raw:<10} -> {normalize_symbol(raw):<10} id {sid if sid != UNKNOWN_ID else 'brak'}")
+    print(f"Rejestr: {len(get_registry()['symbols'])} symboli w {SYMBOLS_FILE}")
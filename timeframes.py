@@ -0,0 +1,77 @@
+import os
+
+# --- WYŻSZE INTERWAŁY (TYGODNIOWY, MIESIĘCZNY) ---
+# Zamiast pobierać z Yahoo osobno dane tygodniowe i miesięczne, dzienną
+# macierz cen (daty × tickery, po align_sessions) agregujemy raz na
+# uruchomienie: Open = pierwsza, High = max, Low = min, Close = ostatnia,
+# Volume = suma sesji w okresie - dla wszystkich tickerów naraz.
+# Wskaźniki i sygnały liczy ten sam silnik co dla świec dziennych
+# (scanner.compute_indicators / find_signals).
+
+from providers import LOCAL_PROVIDERS, PRICE_PROVIDER
+
+# Interwały włączone w skanie, np. "W,M"; pusty = tylko świece dzienne.
+# Domyślnie włączone tylko przy źródle z lokalną historią (cache, pliki):
+# z PRICE_PROVIDER=yahoo potrzebna historia (2y/5y zamiast 7mo) oznaczałaby
+# kilkukrotnie większe pobieranie przy każdym uruchomieniu - tam to opcja.
+_DEFAULT_TIMEFRAMES = 'W,M' if PRICE_PROVIDER in LOCAL_PROVIDERS else ''
+SCAN_TIMEFRAMES = [tf.strip() for tf in os.environ.get('SCAN_TIMEFRAMES', _DEFAULT_TIMEFRAMES).split(',') if tf.strip()]
+
+# rule: reguła pandas.resample; period: dzienna historia potrzebna, by MA50
+# na danym interwale miała zapas na okno przecięć; lookback: ile ostatnich
+# świec sprawdzamy (0 = bieżąca, jeszcze niezamknięta świeca); min_bars:
+# najmniej świec, przy których MA50 istnieje na całym oknie przecięć
+# (50 + lookback) - 5y to tylko ~61 świec miesięcznych, więc dzienne
+# minimum 60 odcinałoby spółki z historią nieco krótszą niż 5 lat.
+TIMEFRAMES = {
+    'W': {'rule': 'W-FRI', 'period': '2y', 'lookback': 2, 'min_bars': 52, 'label': 'Tygodniowy'},
+    'M': {'rule': 'ME', 'period': '5y', 'lookback': 1, 'min_bars': 51, 'label': 'Miesięczny'},
+}
+AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+def scan_period(daily_period, timeframes=SCAN_TIMEFRAMES):
+    """
+    Najdłuższa historia potrzebna dla świec dziennych i włączonych interwałów
+    - dane dzienne pobierane są raz, w tym zakresie.
+    """
+    from scanner import SESSIONS_PER_PERIOD
+    periods = [daily_period] + [TIMEFRAMES[tf]['period'] for tf in timeframes if tf in TIMEFRAMES]
+    return max(periods, key=lambda p: SESSIONS_PER_PERIOD.get(p, 252))
+
+def resample_prices(px, timeframe):
+    """
+    Agreguje dzienne macierze cen (price_fields / align_sessions) do świec
+    danego interwału. Świeca jest oznaczona datą ostatniej sesji w okresie,
+    więc bieżący, niezamknięty tydzień/miesiąc nie dostaje daty z przyszłości.
+    """
+    import pandas as pd
+    rule = TIMEFRAMES[timeframe]['rule']
+    close = px['Close']
+    last_session = pd.Series(close.index, index=close.index).resample(rule).last().dropna()
+    out = {}
+    for field, m in px.items():
+        how = AGGREGATIONS.get(field)
+        if how is None:
+            continue
+        grouped = m.resample(rule)
+        # min_count=1: okres bez notowań tickera ma NaN, a nie zerowy wolumen
+        agg = grouped.sum(min_count=1) if how == 'sum' else getattr(grouped, how)()
+        out[field] = agg.loc[last_session.index].set_axis(pd.DatetimeIndex(last_session.to_numpy()), axis=0)
+    return out
+
+def timeframe_signals(px, metadata, timeframes=SCAN_TIMEFRAMES, tickers=None):
+    """
+    Przecięcia MA20/MA50 na wyższych interwałach dla paczki. Zwraca listę
+    wierszy jak find_signals, z dodatkowymi kluczami 'timeframe' i 'signal'.
+    """
+    from scanner import compute_indicators, find_signals
+    rows = []
+    for tf in timeframes:
+        if tf not in TIMEFRAMES:
+            continue
+        ind = compute_indicators(resample_prices(px, tf))
+        spec = TIMEFRAMES[tf]
+        bull, bear = find_signals(ind, metadata, spec['lookback'], tickers=tickers, min_history=spec['min_bars'])
+        rows.extend({**r, 'timeframe': tf, 'signal': 'bullish'} for r in bull)
+        rows.extend({**r, 'timeframe': tf, 'signal': 'bearish'} for r in bear)
+    return rows
@@ -0,0 +1,155 @@
+# --- KALENDARZ SESJI GIEŁDOWYCH (NYSE) ---
+# Wynik yf.download ma dla różnych tickerów różne brakujące dni, a pętle
+# z data[ticker].dropna() sprawiały, że "dziś" i "wczoraj" (iloc[-1], iloc[-2])
+# mogły oznaczać różne daty dla różnych spółek. Tu wszystkie tickery są
+# wyrównywane do jednej osi sesji, więc kod wskaźników może używać stałych
+# przesunięć wierszy (-1 = ostatnia sesja, -2 = poprzednia) dla całej macierzy.
+#
+# Nazwa modułu celowo nie "calendar" - to moduł biblioteki standardowej.
+
+MAX_FILL_SESSIONS = 3      # luki wewnątrz historii do 3 sesji wypełniamy ostatnią ceną
+MIN_SESSION_COVERAGE = 0.5 # dzień z kalendarza, w którym notowana jest < 50% spółek = nadzwyczajne zamknięcie
+EXCHANGE_TZ = 'America/New_York'
+CLOSE_SETTLE = '16:30'     # zamknięcie 16:00 + zapas, aż świeca dzienna w Yahoo będzie ostateczna
+
+def nyse_holidays(start, end):
+    """
+    Święta NYSE w przedziale dat (reguły stałe; nadzwyczajne zamknięcia,
+    np. żałoba narodowa, wykrywane są z danych w align_sessions).
+    """
+    from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay,
+                                        USMartinLutherKingJr, USMemorialDay, USPresidentsDay,
+                                        USThanksgivingDay, nearest_workday, sunday_to_monday)
+
+    class NYSECalendar(AbstractHolidayCalendar):
+        rules = [
+            Holiday('NewYearsDay', month=1, day=1, observance=sunday_to_monday),
+            USMartinLutherKingJr,
+            USPresidentsDay,
+            GoodFriday,
+            USMemorialDay,
+            Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+            Holiday('USIndependenceDay', month=7, day=4, observance=nearest_workday),
+            USLaborDay,
+            USThanksgivingDay,
+            Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+        ]
+
+    return NYSECalendar().holidays(start, end)
+
+def sessions_between(start, end):
+    """
+    Dni sesyjne NYSE (dni robocze bez świąt) od start do end włącznie.
+    """
+    import pandas as pd
+    from pandas.tseries.offsets import CustomBusinessDay
+    return pd.date_range(start, end, freq=CustomBusinessDay(holidays=nyse_holidays(start, end)))
+
+def last_closed_session(now=None):
+    """
+    (data ostatniej zakończonej sesji, chwila jej zamknięcia + zapas jako Timestamp
+    ze strefą). Świece od kolejnej sesji to dane z trwającego dnia.
+    """
+    import pandas as pd
+    now = pd.Timestamp.now(tz=EXCHANGE_TZ) if now is None else pd.Timestamp(now).tz_convert(EXCHANGE_TZ)
+    today = now.tz_localize(None).normalize()
+    for day in reversed(sessions_between(today - pd.Timedelta(days=14), today)):
+        closed = pd.Timestamp(f"{day:%Y-%m-%d} {CLOSE_SETTLE}").tz_localize(EXCHANGE_TZ)
+        if closed <= now:
+            return day, closed
+    raise ValueError(f"Brak sesji w ostatnich 14 dniach przed {today:%Y-%m-%d}")
+
+def session_in_progress(now=None):
+    """
+    True od otwarcia (9:30) dzisiejszej sesji do jej zamknięcia z zapasem (CLOSE_SETTLE).
+    """
+    import pandas as pd
+    now = pd.Timestamp.now(tz=EXCHANGE_TZ) if now is None else pd.Timestamp(now).tz_convert(EXCHANGE_TZ)
+    today = now.tz_localize(None).normalize()
+    if not len(sessions_between(today, today)):
+        return False
+    opened = pd.Timestamp(f"{today:%Y-%m-%d} 09:30").tz_localize(EXCHANGE_TZ)
+    return opened <= now < pd.Timestamp(f"{today:%Y-%m-%d} {CLOSE_SETTLE}").tz_localize(EXCHANGE_TZ)
+
+def _normalize_index(index):
+    import pandas as pd
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+def session_index(close, last_session=None):
+    """
+    Oś sesji dla macierzy Close z indeksem dziennym bez powtórzeń: dni kalendarza
+    NYSE od pierwszego notowania do ostatniego (co najmniej do last_session), bez
+    dni, w których notowana jest mniej niż MIN_SESSION_COVERAGE spółek. Pokrycie
+    liczone jest tylko wśród spółek, których historia danego dnia już się zaczęła
+    i jeszcze nie skończyła - świeże debiuty nie "zamykają" wcześniejszych sesji.
+    """
+    import numpy as np
+    import pandas as pd
+    end = close.index.max()
+    if last_session is not None:
+        last_session = _normalize_index([last_session])[0]
+        end = max(end, last_session)
+    calendar = sessions_between(close.index.min(), end)
+    has_data = close.notna().to_numpy()
+    live = np.maximum.accumulate(has_data, axis=0) & np.maximum.accumulate(has_data[::-1], axis=0)[::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage = has_data.sum(axis=1) / live.sum(axis=1)
+    coverage = pd.Series(np.nan_to_num(coverage, nan=0.0), index=close.index).reindex(calendar, fill_value=0.0)
+    keep = coverage.to_numpy() >= MIN_SESSION_COVERAGE
+    if last_session is not None:
+        keep |= calendar == last_session
+    return calendar[keep]
+
+def session_rows(close):
+    """
+    Maska wierszy surowej macierzy Close (np. prosto z yf.download), które są
+    sesjami osi z session_index - bez weekendowych artefaktów i dni zamknięcia.
+    """
+    dates = _normalize_index(close.index)
+    if close.empty:
+        return dates.notna()
+    unique = close.set_axis(dates, axis=0)
+    unique = unique[~unique.index.duplicated(keep='last')]
+    return dates.isin(session_index(unique))
+
+def align_sessions(px, last_session=None):
+    """
+    Wyrównuje macierze cen (price_fields) do wspólnej osi sesji NYSE.
+    - wiersze spoza kalendarza (np. weekendowe artefakty) są usuwane,
+    - dni kalendarza bez notowań większości spółek (nadzwyczajne zamknięcie) też,
+    - luki wewnątrz historii tickera do MAX_FILL_SESSIONS sesji są wypełniane
+      ostatnią ceną (wolumen = 0); po ostatnim notowaniu nic nie jest dopisywane.
+    last_session - ostatnia sesja znana z całego uniwersum (skan paczkami):
+    oś sięga co najmniej do niej, nawet jeśli w tej paczce nikt jej nie ma,
+    więc paczka z samych nieaktualnych tickerów nie przesuwa wiersza -1.
+    Zwraca (px_wyrównane, info), gdzie info zawiera 'sessions', 'last_pos'
+    (indeks ostatniego notowania tickera) i 'stale' (tickery bez ostatniej sesji).
+    """
+    import numpy as np
+    import pandas as pd
+    px = {f: m.set_axis(_normalize_index(m.index), axis=0) for f, m in px.items()}
+    px = {f: m[~m.index.duplicated(keep='last')] for f, m in px.items()}
+    close = px['Close']
+    if close.empty:
+        return px, {'sessions': close.index, 'last_pos': np.array([], dtype=int), 'stale': []}
+
+    sessions = session_index(close, last_session)
+
+    aligned = {f: m.reindex(sessions) for f, m in px.items()}
+    has_data = aligned['Close'].notna().to_numpy()
+    n = len(sessions)
+    last_pos = np.where(has_data.any(axis=0), n - 1 - has_data[::-1].argmax(axis=0), -1)
+    # Wypełniamy tylko luki przed ostatnim notowaniem tickera
+    inside = np.arange(n)[:, None] <= last_pos[None, :]
+    filled_gap = aligned['Close'].isna() & aligned['Close'].ffill(limit=MAX_FILL_SESSIONS).where(inside).notna()
+    for f, m in aligned.items():
+        if f == 'Volume':
+            aligned[f] = m.mask(filled_gap, 0.0)
+        else:
+            aligned[f] = m.ffill(limit=MAX_FILL_SESSIONS).where(inside)
+
+    stale = list(close.columns[(last_pos >= 0) & (last_pos < n - 1)])
+    return aligned, {'sessions': sessions, 'last_pos': last_pos, 'stale': stale}
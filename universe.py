@@ -0,0 +1,88 @@
+import sys
+
+# --- UNIWERSUM WIELU INDEKSÓW ---
+# Łączy listy spółek z wielu źródeł (SOURCES) w jeden zbiór symboli bez
+# duplikatów. Każdy symbol jest pobierany z Yahoo tylko raz, a wyniki są
+# potem rozdzielane z powrotem na indeksy do raportu.
+
+INDEX_SOURCES = {
+    'S&P 500 (Large Cap)': 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies',
+    'S&P 400 (Mid Cap)': 'https://en.wikipedia.org/wiki/List_of_S%26P_400_companies',
+    'S&P 600 (Small Cap)': 'https://en.wikipedia.org/wiki/List_of_S%26P_600_companies'
+}
+
+def get_tickers_metadata(url):
+    from symbols import symbol_ids, symbols_for
+    from wiki_tables import fetch_constituents
+    try:
+        # Tylko pierwsza tabela (skład), parsowana strumieniowo - patrz wiki_tables.py
+        table = fetch_constituents(url)
+        # Forma z Wikipedii (BRK.B) trafia do rejestru jako alias symbolu Yahoo (BRK-B)
+        return dict(zip(symbols_for(symbol_ids(list(table))), table.values()))
+    except Exception as e:
+        print(f"Błąd metadanych: {e}")
+        return {}
+
+def merge_universe(index_metadata):
+    """
+    Scala słowniki {indeks: {symbol: {'Name', 'Sector'}}} w jedno uniwersum.
+    Zwraca (metadata, members):
+      metadata - {symbol: {'Name', 'Sector', 'ID', 'Indexes': [indeksy]}}, każdy symbol raz
+                 (ID z rejestru symbols.py),
+      members  - {indeks: [symbole]} w kolejności ze źródła.
+    Przy konflikcie nazwy/sektora wygrywa pierwsze źródło.
+    """
+    metadata, members = {}, {}
+    for index_name, meta in index_metadata.items():
+        members[index_name] = list(meta.keys())
+        for symbol, info in meta.items():
+            if symbol in metadata:
+                metadata[symbol]['Indexes'].append(index_name)
+            else:
+                metadata[symbol] = {'Name': info.get('Name', 'N/A'), 'Sector': info.get('Sector', 'N/A'),
+                                    'Indexes': [index_name]}
+    if metadata:
+        from symbols import symbol_ids
+        for symbol, sid in zip(metadata, symbol_ids(list(metadata))):
+            metadata[symbol]['ID'] = int(sid)
+    return metadata, members
+
+def load_universe(sources, fetch=get_tickers_metadata):
+    """
+    Pobiera listy spółek dla wszystkich źródeł {nazwa: url} (równolegle) i scala
+    je przez merge_universe. Wypisuje, ile pobrań oszczędza deduplikacja.
+    """
+    from symbols import save_registry
+    from wiki_tables import fetch_all
+    metadata, members = merge_universe(fetch_all(sources, fetch))
+    save_registry()
+    total = sum(len(m) for m in members.values())
+    print(f"Uniwersum: {len(metadata)} unikalnych symboli z {len(members)} indeksów "
+          f"({total - len(metadata)} duplikatów pominiętych przy pobieraniu).")
+    return metadata, members
+
+def split_by_index(rows, members):
+    """
+    Rozdziela listę wyników (słowniki z kluczem 'ticker') na indeksy.
+    Symbol należący do kilku indeksów trafia do każdego z nich.
+    Kolejność wierszy w obrębie indeksu jest zachowana.
+    """
+    index_of = {}
+    for index_name, symbols in members.items():
+        for symbol in symbols:
+            index_of.setdefault(symbol, []).append(index_name)
+
+    result = {index_name: [] for index_name in members}
+    for row in rows:
+        for index_name in index_of.get(row['ticker'], []):
+            result[index_name].append(row)
+    return result
+
+if __name__ == "__main__":
+    # Podgląd pokrycia indeksów: python universe.py
+    meta, mem = load_universe(INDEX_SOURCES)
+    if not meta:
+        sys.exit(1)
+    for name, symbols in mem.items():
+        shared = sum(1 for s in symbols if len(meta[s]['Indexes']) > 1)
+        print(f"  {name}: {len(symbols)} spółek, {shared} wspólnych z innymi indeksami")
@@ -0,0 +1,104 @@
+# --- WALIDACJA JAKOŚCI DANYCH ---
+# Sprawdzenia wykonywane wektorowo na całej macierzy cen (daty × tickery)
+# przed liczeniem wskaźników. Błędny tick, zerowy wolumen czy "zamrożona"
+# cena potrafią wygenerować fałszywe przecięcie średnich.
+#
+# Tickery z błędem krytycznym trafiają do kwarantanny (są usuwane z paczki),
+# pozostałe problemy są tylko raportowane. Sprawdzane są tylko wiersze będące
+# sesjami NYSE (trading_calendar.session_rows) - pojedynczy weekendowy
+# artefakt albo dzień z notowaniem garstki spółek nie staje się "ostatnią
+# sesją", której brak reszcie tickerów.
+# Brak ostatniej sesji jest tylko raportowany (skan i tak wykrywa nieaktualne
+# tickery w align_sessions), a skok ceny trafia do kwarantanny tylko jako
+# błędny tick: skok, który w następnej sesji wraca do poprzedniego poziomu.
+# Trwała luka (przejęcie, wyniki, wiadomości biotech) to zwykły ruch rynku.
+
+MAX_DAILY_JUMP = 0.5       # |zmiana Close| > 50% w jedną sesję = podejrzany tick
+SPIKE_REVERT = 0.1         # po skoku Close wraca na ±10% poziomu sprzed skoku = błędny tick
+STALE_SESSIONS = 5         # tyle identycznych zamknięć z rzędu = cena zamrożona
+MAX_GAP_RATIO = 0.05       # > 5% brakujących sesji od debiutu = dziurawa historia
+CHECK_WINDOW = 60          # skoki i zera sprawdzamy w oknie używanym przez MA50
+
+CRITICAL_CHECKS = ['non_positive', 'stale_price', 'bad_tick', 'zero_volume_last']
+
+def validate_prices(px):
+    """
+    Sprawdza macierze cen z price_fields. Zwraca (px_bez_kwarantanny, raport),
+    gdzie raport to DataFrame tickery × sprawdzenia (bool) z kolumną 'quarantine'
+    - tylko dla tickerów, w których coś wykryto.
+    """
+    import numpy as np
+    import pandas as pd
+    from trading_calendar import session_rows
+    raw = px
+    rows = session_rows(px['Close'])
+    px = {f: m[rows] for f, m in px.items()}
+    close = px['Close'].to_numpy(dtype=float)
+    window = slice(-CHECK_WINDOW, None)
+    has_data = ~np.isnan(close)
+    started = np.maximum.accumulate(has_data, axis=0)
+
+    checks = {}
+    ohlc = [px[f].to_numpy(dtype=float)[window] for f in ('Open', 'High', 'Low', 'Close') if f in px]
+    checks['non_positive'] = np.any([(m <= 0).any(axis=0) for m in ohlc], axis=0)
+    checks['missing_last_bar'] = started[-1] & ~has_data[-1] & has_data.any(axis=0)
+
+    recent = close[-STALE_SESSIONS:]
+    checks['stale_price'] = (np.nanmax(recent, axis=0, initial=-np.inf) == np.nanmin(recent, axis=0, initial=np.inf)) \
+        & (has_data[-STALE_SESSIONS:].sum(axis=0) == STALE_SESSIONS)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = close[1:] / close[:-1] - 1          # wiersz k: zmiana w sesji k+1
+        back = np.abs(close[2:] / close[:-2] - 1)    # wiersz k: od sesji k do k+2
+        jump = np.nan_to_num(np.abs(change), nan=0.0) > MAX_DAILY_JUMP
+        # Błędny tick: skok w sesji, w następnej skok z powrotem blisko poziomu sprzed pierwszego
+        bad_tick = jump[:-1] & jump[1:] & (back <= SPIKE_REVERT)
+    checks['extreme_jump'] = jump[window].any(axis=0)
+    checks['bad_tick'] = bad_tick[window].any(axis=0)
+
+    if 'High' in px and 'Low' in px:
+        checks['high_below_low'] = (px['High'].to_numpy(dtype=float)[window] < px['Low'].to_numpy(dtype=float)[window]).any(axis=0)
+    if 'Volume' in px:
+        volume = px['Volume'].to_numpy(dtype=float)
+        checks['zero_volume_last'] = has_data[-1] & (volume[-1] <= 0)
+        checks['zero_volume_bars'] = (volume[window] <= 0).sum(axis=0) > 0
+
+    gaps = (started & ~has_data).sum(axis=0)
+    checks['gaps'] = gaps > MAX_GAP_RATIO * np.maximum(started.sum(axis=0), 1)
+
+    report = pd.DataFrame(checks, index=px['Close'].columns)
+    report['quarantine'] = report[[c for c in CRITICAL_CHECKS if c in report]].any(axis=1)
+    report = report[report.any(axis=1)]
+
+    bad = report.index[report['quarantine']]
+    px = raw
+    if len(bad):
+        px = {f: m.drop(columns=bad, errors='ignore') for f, m in px.items()}
+    return px, report
+
+def validate_download(data):
+    """
+    To samo dla surowego wyniku yf.download(group_by='ticker'): zwraca ramkę
+    bez tickerów z kwarantanny (dla skryptów z pętlą po tickerach).
+    """
+    import pandas as pd
+    from indicators import price_fields
+    if data is None or data.empty or not isinstance(data.columns, pd.MultiIndex):
+        return data
+    _, report = validate_prices(price_fields(data))
+    bad = list(report.index[report['quarantine']])
+    if bad:
+        print(f"Walidacja danych: kwarantanna {len(bad)} tickerów: {', '.join(bad[:20])}{'...' if len(bad) > 20 else ''}")
+        data = data.drop(columns=bad, level=0)
+        data.columns = data.columns.remove_unused_levels()
+    return data
+
+def summarize(report):
+    """
+    Krótki opis raportu walidacji: liczba tickerów na każde sprawdzenie.
+    """
+    if report is None or report.empty:
+        return "Walidacja danych: bez uwag."
+    counts = report.drop(columns='quarantine').sum()
+    parts = [f"{name}: {int(n)}" for name, n in counts.items() if n]
+    return f"Walidacja danych: kwarantanna {int(report['quarantine'].sum())} tickerów ({', '.join(parts)})."
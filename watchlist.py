@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+
+# --- SZYBKI SKAN LISTY OBSERWOWANYCH / PORTFELA ---
+# Sprawdzenie kilkudziesięciu trzymanych pozycji bez pełnego skanu
+# S&P 500/600: tylko symbole z pliku, ceny z lokalnego cache (price_cache.py,
+# sieć tylko dla brakujących lub nieaktualnych tickerów; inne źródło przez
+# PRICE_PROVIDER - patrz providers.py) i ten sam silnik
+# wskaźników co SP500_SP600_scan. Przy ciepłym cache wynik w < 1 s, więc
+# można go uruchamiać na żądanie wiele razy dziennie (w trakcie sesji
+# bieżąca świeca jest zawsze dociągana z Yahoo i nie trafia do cache):
+#   python watchlist.py [plik]
+#
+# Plik: jeden symbol w wierszu (dowolna forma: BRK.B, BRK-B), po symbolu
+# mogą być inne kolumny (np. liczba akcji) - są pomijane; '#' = komentarz.
+
+WATCHLIST_FILE = os.environ.get('WATCHLIST_FILE', 'watchlist.txt')
+LOOKBACK_WINDOW = 5
+
+def load_watchlist(path=WATCHLIST_FILE):
+    """
+    Symbole z pliku listy (forma Yahoo, bez powtórzeń, w kolejności z pliku).
+    """
+    from symbols import normalize_symbol
+    symbols = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].replace(',', ' ').split()
+            if line:
+                symbol = normalize_symbol(line[0])
+                if symbol not in symbols:
+                    symbols.append(symbol)
+    return symbols
+
+def scan_watchlist(symbols, lookback_window=LOOKBACK_WINDOW):
+    """
+    Stan każdego symbolu z listy: cena, MA20/MA50 i odległość między nimi,
+    cena wyzwalająca przecięcie jutro (scanner.near_cross), RSI, ADX oraz
+    przecięcie z ostatnich lookback_window sesji. Zwraca
+    (DataFrame indeksowany symbolem, raport walidacji, symbole bez danych).
+    """
+    import pandas as pd
+    from providers import get_prices
+    from scanner import compute_indicators, find_signals, near_cross, ticker_snapshot
+    from trading_calendar import align_sessions
+    from validation import validate_prices
+    meta = {s: {'Name': s, 'Sector': 'N/A'} for s in symbols}
+    px = get_prices(symbols, period='7mo', provider=os.environ.get('PRICE_PROVIDER', 'cache'))
+    if not px:
+        return pd.DataFrame(), pd.DataFrame(), list(symbols)
+    px, issues = validate_prices(px)
+    px, cal = align_sessions(px)
+    ind = compute_indicators(px)
+    snap = ticker_snapshot(ind, meta, cross_window=lookback_window).join(near_cross(ind))
+    bull, bear = find_signals(ind, meta, lookback_window, tickers=symbols)
+
+    snap['signal'] = ''
+    for rows, label in ((bull, 'Golden'), (bear, 'Death')):
+        for r in rows:
+            snap.loc[r['ticker'], 'signal'] = label if r['age'] == 0 else f"{label} {r['age']}d"
+    snap['stale'] = snap.index.isin(cal['stale'])
+    missing = [s for s in symbols if s not in snap.index and s not in issues.index]
+    return snap.reindex([s for s in symbols if s in snap.index]), issues, missing
+
+def format_watchlist(snap):
+    """
+    Tabela tekstowa do konsoli.
+    """
+    fmt = lambda v, spec: "-" if v != v else format(v, spec)
+    lines = [f"{'Ticker':<8} {'Data':<10} {'Cena':>9} {'MA20':>9} {'MA50':>9} {'MA20-50':>8} "
+             f"{'Przecięcie przy':>17} {'RSI':>5} {'ADX':>5}  Sygnał"]
+    for t, r in snap.iterrows():
+        lines.append(f"{t:<8} {r['date']:%Y-%m-%d} {fmt(r['close'], '9.2f')} {fmt(r['ma20'], '9.2f')} "
+                     f"{fmt(r['ma50'], '9.2f')} {fmt(r['cross_gap'], '+7.1f')}% "
+                     f"{fmt(r['trigger_price'], '9.2f')} ({fmt(r['trigger_pct'], '+5.1f')}%) {fmt(r['rsi'], '5.1f')} "
+                     f"{fmt(r['adx'], '5.1f')}  {r['signal']}{' (brak ostatniej sesji)' if r['stale'] else ''}")
+    return "\n".join(lines)
+
+def main():
+    start = time.perf_counter()
+    # Dla kilkudziesięciu tickerów start Numby (import + wczytanie skompilowanych
+    # pętli) trwa dłużej niż same obliczenia w NumPy
+    os.environ.setdefault('INDICATORS_BACKEND', 'numpy')
+    path = sys.argv[1] if len(sys.argv) > 1 else WATCHLIST_FILE
+    try:
+        symbols = load_watchlist(path)
+    except OSError as e:
+        print(f"Nie można wczytać listy obserwowanych: {e}")
+        sys.exit(1)
+    if not symbols:
+        print(f"Lista {path} jest pusta.")
+        return
+    snap, issues, missing = scan_watchlist(symbols)
+    print(format_watchlist(snap))
+    if not issues.empty:
+        from validation import summarize
+        print(summarize(issues))
+        for t, r in issues.iterrows():
+            flags = [c for c in issues.columns if c != 'quarantine' and r[c]]
+            print(f"  {t}: {', '.join(flags)}{' - pominięty' if r['quarantine'] else ''}")
+    if missing:
+        print(f"Brak danych: {', '.join(missing)}")
+    print(f"{len(symbols)} symboli w {time.perf_counter() - start:.2f} s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import html
+import re
+import sys
+
+# --- LISTY SPÓŁEK Z WIKIPEDII BEZ pd.read_html ---
+# Strony S&P 500/600 mają kilkanaście tabel (skład, historia zmian,
+# nawigacja), a pd.read_html parsuje całą stronę do drzewa lxml i buduje
+# DataFrame dla każdej z nich - używana jest tylko pierwsza. Tu HTML czytany
+# jest przyrostowo, znacznik po znaczniku (leniwy finditer), tylko znaczniki
+# struktury tabeli są rozpoznawane, a czytanie kończy się razem z pierwszą
+# tabelą, w której nagłówku jest kolumna Symbol - reszta strony nie jest
+# nawet przeglądana.
+
+# Nazwy kolumn z Wikipedii -> nazwy używane w skanerach
+COLUMN_NAMES = {'Symbol': 'Symbol', 'Security': 'Name', 'Company': 'Name', 'GICS Sector': 'Sector'}
+_STRUCTURE = re.compile(r'<(/?)(table|tr|td|th|sup|style|br)\b[^>]*>', re.I)
+_ANY_TAG = re.compile(r'<[^>]*>')
+
+def _cell_text(parts):
+    # Tekst komórki jak w read_html: bez znaczników (linki, span), encje zamienione, białe znaki złączone
+    return ' '.join(html.unescape(_ANY_TAG.sub('', ''.join(parts))).split())
+
+def first_table(text, key_column='Symbol'):
+    """
+    Pierwsza tabela strony z kolumną key_column w nagłówku:
+    (nagłówek, [wiersze]) jako listy tekstów komórek. Brak tabeli = ValueError.
+    Przypisy (<sup>[1]</sup>) nie wchodzą do tekstu komórek; rowspan/colspan
+    nie są rozwijane (tabele składu indeksów ich nie używają).
+    """
+    rows, row, cell = [], None, None
+    depth = skip = 0             # zagnieżdżenie <table> (liczy się poziom 1), <sup>/<style>
+    pos = 0
+    for m in _STRUCTURE.finditer(text):
+        if cell is not None and not skip:
+            cell.append(text[pos:m.start()])
+        pos = m.end()
+        closing, tag = m.group(1), m.group(2).lower()
+        if tag == 'table':
+            depth += -1 if closing else 1
+            if closing and depth == 0:
+                if cell is not None and row is not None:
+                    row.append(_cell_text(cell))
+                if row:
+                    rows.append(row)
+                row = cell = None
+                if rows and key_column in rows[0]:
+                    header, *rows = rows
+                    return header, [r for r in rows if len(r) == len(header)]
+                rows = []
+        elif depth != 1:
+            continue
+        elif tag in ('sup', 'style'):
+            skip = max(skip - 1, 0) if closing else skip + 1
+        elif tag == 'br':
+            if cell is not None and not skip:
+                cell.append(' ')
+        else:
+            # Nowa komórka/wiersz zamyka poprzednią komórkę także bez </td> (dozwolone w HTML)
+            if cell is not None and row is not None:
+                row.append(_cell_text(cell))
+            cell = None
+            if tag == 'tr':
+                if row:
+                    rows.append(row)
+                row = None if closing else []
+            elif not closing:
+                cell = []
+    raise ValueError(f"Brak tabeli z kolumną {key_column}")
+
+def constituents(text):
+    """
+    Skład indeksu ze strony Wikipedii: {symbol z Wikipedii: {'Name', 'Sector'}}
+    w kolejności z tabeli (jak pd.read_html(...)[0] po zmianie nazw kolumn).
+    """
+    header, rows = first_table(text, 'Symbol')
+    columns = {COLUMN_NAMES[h]: i for i, h in reversed(list(enumerate(header))) if h in COLUMN_NAMES}
+    out = {}
+    for r in rows:
+        out[r[columns['Symbol']]] = {f: r[columns[f]] if f in columns else 'N/A' for f in ('Name', 'Sector')}
+    return out
+
+def fetch_constituents(url, headers=None):
+    """
+    Pobiera stronę (przez replay.http_get) i zwraca constituents().
+    """
+    from replay import http_get
+    response = http_get(url, headers=headers or {"User-Agent": "Mozilla/5.0"})
+    response.raise_for_status()
+    return constituents(response.text)
+
+def fetch_all(urls, fetch=fetch_constituents, max_workers=4):
+    """
+    {nazwa: url} -> {nazwa: wynik fetch(url)}, wszystkie źródła równolegle
+    (wątki: czas to głównie oczekiwanie na sieć). Kolejność kluczy jak w urls.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls)) or 1) as pool:
+        futures = {name: pool.submit(fetch, url) for name, url in urls.items()}
+        return {name: f.result() for name, f in futures.items()}
+
+if __name__ == "__main__":
+    # Podgląd: python wiki_tables.py URL
+    table = fetch_constituents(sys.argv[1])
+    for symbol, info in list(table.items())[:5]:
+        print(f"  {symbol:<8} {info['Name']:<40} {info['Sector']}")
+    print(f"{len(table)} spółek")